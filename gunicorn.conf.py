@@ -0,0 +1,23 @@
+# Настройки gunicorn: gunicorn --config gunicorn.conf.py src.main:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Долгие соединения потока событий (SSE) требуют потоковых воркеров
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# Приложение загружается в мастер-процессе один раз, воркеры получают его через fork
+preload_app = True
+
+
+def when_ready(server):
+    """Схема и индексы в памяти создаются в мастере до запуска воркеров"""
+    from src.main import app, init_database
+    report = init_database(app)
+    server.log.info('Startup report: %s', ', '.join(f'{key}={value}' for key, value in report.items()))
+
+
+def post_fork(server, worker):
+    from src.main import app, init_worker
+    init_worker(app)
+    server.log.info('Worker %s ready', worker.pid)
@@ -0,0 +1,384 @@
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # numpy — необязательная зависимость, без нее агрегация выполняется циклом
+    np = None
+
+from sqlalchemy import func, or_, select, union_all
+
+from src.models.financial import db, Transaction, ArchivedTransaction, TransactionType
+from src.archive import transaction_models
+from src.periods import period_bucket
+from src.incremental import EPOCH, IdWindow, to_cents, to_day
+TYPES = list(TransactionType)
+TYPE_CODES = {transaction_type: code for code, transaction_type in enumerate(TYPES)}
+
+TIME_DIMENSIONS = ('year', 'month', 'week', 'day')
+# Измерения-справочники хранятся в словарном кодировании: код 0 — пустое значение
+ENTITY_DIMENSIONS = {
+    'user': 'user_id',
+    'from_account': 'from_account_id',
+    'to_account': 'to_account_id',
+    'income_category': 'income_category_id',
+    'expense_category': 'expense_category_id',
+    'direction': 'business_direction_id',
+}
+DIMENSIONS = ('type',) + TIME_DIMENSIONS + tuple(ENTITY_DIMENSIONS)
+MEASURES = ('sum', 'count', 'avg')
+
+
+class PivotError(ValueError):
+    """Некорректные параметры сводной таблицы"""
+
+
+def _row_columns(model):
+    return [
+        model.id,
+        model.transaction_date,
+        model.amount,
+        model.transaction_type,
+        *[getattr(model, column) for column in ENTITY_DIMENSIONS.values()]
+    ]
+
+
+def _time_label(dimension, key):
+    """Подпись периода в том же формате, что и period_bucket в SQL"""
+    if dimension == 'year':
+        return str(key)
+    if dimension == 'month':
+        return f'{key // 12}-{key % 12 + 1:02d}'
+    return (EPOCH + timedelta(days=key)).isoformat()
+
+
+def _sort_key(label):
+    return (label is None, label)
+
+
+def _parse_time_value(dimension, value):
+    """Проверка значения фильтра по периоду и приведение к подписи period_bucket (YYYY, YYYY-MM, YYYY-MM-DD)"""
+    try:
+        if dimension == 'year':
+            return str(int(value))
+        if dimension == 'month':
+            year, month = value.split('-')
+            return date(int(year), int(month), 1).strftime('%Y-%m')
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise PivotError(f'Invalid {dimension} value "{value}"')
+
+
+def parse_filters(raw):
+    """Разбор фильтров вида "type:expense;direction:1,2" (null — пустое значение)"""
+    filters = {}
+    for part in filter(None, (raw or '').split(';')):
+        dimension, _, values = part.partition(':')
+        if dimension not in DIMENSIONS or not values:
+            raise PivotError(f'Invalid filter "{part}"')
+        parsed = set()
+        for value in values.split(','):
+            if dimension == 'type':
+                try:
+                    parsed.add(TransactionType(value).value)
+                except ValueError:
+                    raise PivotError(f'Unknown transaction type "{value}"')
+            elif dimension in ENTITY_DIMENSIONS:
+                if value == 'null':
+                    parsed.add(None)
+                elif value.isdigit():
+                    parsed.add(int(value))
+                else:
+                    raise PivotError(f'Invalid id "{value}" for {dimension}')
+            else:
+                parsed.add(_parse_time_value(dimension, value))
+        filters[dimension] = parsed
+    return filters
+
+
+class ColumnStore:
+    """Колоночная копия таблицы transactions в памяти процесса.
+
+    Дата хранится как число дней от 1970-01-01, сумма — в копейках (int64),
+    тип и справочники — в словарном кодировании. Новые операции догружаются
+    по возрастанию id перед каждым запросом.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.state = 'cold'  # cold, loading, ready
+        self.generation = 0
+        self._reset_columns()
+
+    def _reset_columns(self):
+        self.window = IdWindow()
+        self.archive_loaded = False
+        self.day = array('i')
+        self.month = array('i')  # year * 12 + month - 1
+        self.amount = array('q')
+        self.type = array('b')
+        self.codes = {dimension: array('i') for dimension in ENTITY_DIMENSIONS}
+        self.values = {dimension: [None] for dimension in ENTITY_DIMENSIONS}
+        self.index = {dimension: {None: 0} for dimension in ENTITY_DIMENSIONS}
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def reset(self):
+        """Сброс кэша, например после удаления или переноса операций"""
+        with self.lock:
+            self._reset_columns()
+            self.state = 'cold'
+            self.generation += 1
+
+    def _append(self, rows):
+        for transaction_id, transaction_date, amount, transaction_type, *entities in rows:
+            if not self.window.add(transaction_id):
+                continue
+            self.day.append(to_day(transaction_date))
+            self.month.append(transaction_date.year * 12 + transaction_date.month - 1)
+            self.amount.append(to_cents(amount))
+            self.type.append(TYPE_CODES[transaction_type])
+            for dimension, value in zip(ENTITY_DIMENSIONS, entities):
+                code = self.index[dimension].get(value)
+                if code is None:
+                    code = len(self.values[dimension])
+                    self.values[dimension].append(value)
+                    self.index[dimension][value] = code
+                self.codes[dimension].append(code)
+
+    def refresh(self):
+        """Догрузка операций, появившихся после последней загрузки (в том числе из других процессов)"""
+        with self.lock:
+            query = select(*_row_columns(Transaction)).where(self.window.condition())
+            if not self.archive_loaded:
+                # Первая загрузка читает архив тем же запросом, чтобы перенос строк
+                # в архив во время загрузки не привел к пропуску или дублированию
+                query = union_all(query, select(*_row_columns(ArchivedTransaction)))
+            self._append(db.session.execute(query.execution_options(yield_per=10000)))
+            self.archive_loaded = True
+
+    def warm(self, app):
+        """Фоновая загрузка кэша; до ее окончания запросы обслуживаются через SQL"""
+        with self.lock:
+            if self.state != 'cold':
+                return
+            self.state = 'loading'
+            generation = self.generation
+
+        def load():
+            with app.app_context():
+                try:
+                    self.refresh()
+                except Exception:
+                    app.logger.exception('Analytics cache load failed')
+                    self.reset()
+                    return
+                with self.lock:
+                    if self.generation == generation:
+                        self.state = 'ready'
+
+        threading.Thread(target=load, name='analytics-cache-load', daemon=True).start()
+
+    def _key_column(self, dimension):
+        if dimension == 'type':
+            return self.type
+        if dimension == 'month':
+            return self.month
+        if dimension == 'day':
+            return self.day
+        if dimension in ENTITY_DIMENSIONS:
+            return self.codes[dimension]
+        if np is not None:
+            if dimension == 'year':
+                return np.frombuffer(self.month, dtype=np.int32) // 12
+            # 1970-01-01 — четверг, неделя начинается с понедельника
+            day = np.frombuffer(self.day, dtype=np.int32)
+            return day - (day + 3) % 7
+        if dimension == 'year':
+            return [m // 12 for m in self.month]
+        return [d - (d + 3) % 7 for d in self.day]
+
+    def _label(self, dimension, key):
+        if dimension == 'type':
+            return TYPES[key].value
+        if dimension in ENTITY_DIMENSIONS:
+            return self.values[dimension][key]
+        return _time_label(dimension, key)
+
+    def _filter_keys(self, dimension, values):
+        """Перевод значений фильтра в ключи колонки"""
+        if dimension == 'type':
+            return {TYPE_CODES[TransactionType(v)] for v in values}
+        if dimension in ENTITY_DIMENSIONS:
+            return {self.index[dimension][v] for v in values if v in self.index[dimension]}
+        # Значения уже проверены parse_filters
+        keys = set()
+        for value in values:
+            if dimension == 'year':
+                keys.add(int(value))
+            elif dimension == 'month':
+                year, month = value.split('-')
+                keys.add(int(year) * 12 + int(month) - 1)
+            else:
+                keys.add(to_day(date.fromisoformat(value)))
+        return keys
+
+    def pivot(self, rows, cols, filters, start=None, end=None, user_id=None):
+        """Группировка по двум измерениям: {(строка, столбец): (сумма в копейках, количество)}"""
+        conditions = dict(filters)
+        if user_id is not None:
+            conditions['user'] = {user_id}
+
+        with self.lock:
+            # Ключи фильтров вычисляются до создания представлений numpy над массивами
+            conditions = {d: self._filter_keys(d, v) for d, v in conditions.items()}
+            if np is not None:
+                cells = self._pivot_numpy(rows, cols, conditions, start, end)
+            else:
+                cells = self._pivot_python(rows, cols, conditions, start, end)
+            return {
+                (self._label(rows, r), self._label(cols, c) if cols else None): value
+                for (r, c), value in cells.items()
+            }
+
+    def _pivot_numpy(self, rows, cols, conditions, start, end):
+        n = len(self)
+        mask = np.ones(n, dtype=bool)
+        day = np.frombuffer(self.day, dtype=np.int32)
+        if start is not None:
+            mask &= day >= to_day(start)
+        if end is not None:
+            mask &= day <= to_day(end)
+        for dimension, keys in conditions.items():
+            keys = np.fromiter(keys, dtype=np.int64, count=len(keys))
+            mask &= np.isin(np.asarray(self._key_column(dimension)), keys)
+
+        row_keys, row_index = np.unique(np.asarray(self._key_column(rows))[mask], return_inverse=True)
+        if cols:
+            col_keys, col_index = np.unique(np.asarray(self._key_column(cols))[mask], return_inverse=True)
+        else:
+            col_keys, col_index = np.zeros(1, dtype=np.int64), np.zeros(len(row_index), dtype=np.int64)
+
+        combined = row_index * len(col_keys) + col_index
+        size = len(row_keys) * len(col_keys)
+        amounts = np.frombuffer(self.amount, dtype=np.int64)[mask]
+        sums = np.bincount(combined, weights=amounts, minlength=size)
+        counts = np.bincount(combined, minlength=size)
+
+        cells = {}
+        for position in np.flatnonzero(counts):
+            r, c = divmod(int(position), len(col_keys))
+            cells[(int(row_keys[r]), int(col_keys[c]))] = (int(round(sums[position])), int(counts[position]))
+        return cells
+
+    def _pivot_python(self, rows, cols, conditions, start, end):
+        start_day = to_day(start) if start is not None else None
+        end_day = to_day(end) if end is not None else None
+        checks = [(self._key_column(d), keys) for d, keys in conditions.items()]
+        row_column = self._key_column(rows)
+        col_column = self._key_column(cols) if cols else None
+
+        cells = {}
+        for i in range(len(self)):
+            if start_day is not None and self.day[i] < start_day:
+                continue
+            if end_day is not None and self.day[i] > end_day:
+                continue
+            if any(column[i] not in keys for column, keys in checks):
+                continue
+            key = (row_column[i], col_column[i] if cols else 0)
+            total, count = cells.get(key, (0, 0))
+            cells[key] = (total + self.amount[i], count + 1)
+        return cells
+
+
+def _sql_dimension(model, dimension):
+    if dimension == 'type':
+        return model.transaction_type
+    if dimension in TIME_DIMENSIONS:
+        return period_bucket(model.transaction_date, dimension)
+    return getattr(model, ENTITY_DIMENSIONS[dimension])
+
+
+def _sql_label(dimension, value):
+    if dimension == 'type':
+        return value.value
+    if dimension in TIME_DIMENSIONS:
+        return str(value)
+    return value
+
+
+def sql_pivot(rows, cols, filters, start=None, end=None, user_id=None):
+    """То же, что ColumnStore.pivot, но группирующим SQL-запросом (пока кэш не загружен)"""
+    start_time = datetime.combine(start, datetime.min.time()) if start is not None else None
+    end_time = datetime.combine(end + timedelta(days=1), datetime.min.time()) if end is not None else None
+
+    cells = {}
+    for model in transaction_models(start_time, end_time):
+        columns = [_sql_dimension(model, rows).label('row_key')]
+        if cols:
+            columns.append(_sql_dimension(model, cols).label('col_key'))
+
+        query = db.session.query(*columns, func.sum(model.amount), func.count(model.id))
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        if start_time is not None:
+            query = query.filter(model.transaction_date >= start_time)
+        if end_time is not None:
+            query = query.filter(model.transaction_date < end_time)
+        for dimension, values in filters.items():
+            expression = _sql_dimension(model, dimension)
+            if dimension == 'type':
+                query = query.filter(expression.in_([TransactionType(v) for v in values]))
+                continue
+            conditions = [expression.in_([v for v in values if v is not None])]
+            if None in values:
+                conditions.append(expression.is_(None))
+            query = query.filter(or_(*conditions))
+
+        for row in query.group_by(*columns).all():
+            if cols:
+                row_key, col_key, total, count = row
+                col_label = _sql_label(cols, col_key)
+            else:
+                row_key, total, count = row
+                col_label = None
+            key = (_sql_label(rows, row_key), col_label)
+            previous_total, previous_count = cells.get(key, (0, 0))
+            cells[key] = (
+                previous_total + to_cents(total),
+                previous_count + count
+            )
+    return cells
+
+
+def format_pivot(cells, measure):
+    """Компактная матрица: заголовки строк и столбцов и плотный массив значений"""
+    row_labels = sorted({r for r, _ in cells}, key=_sort_key)
+    col_labels = sorted({c for _, c in cells}, key=_sort_key)
+
+    def value(cell):
+        if cell is None:
+            return None if measure == 'avg' else 0
+        total, count = cell
+        if measure == 'count':
+            return count
+        if measure == 'avg':
+            return round(total / count / 100, 2)
+        return total / 100
+
+    return {
+        'rows': row_labels,
+        'columns': col_labels,
+        'data': [[value(cells.get((r, c))) for c in col_labels] for r in row_labels]
+    }
+
+
+# Кэш процесса
+column_store = ColumnStore()
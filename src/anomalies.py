@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, select
+
+from src.models.financial import Transaction, ArchivedTransaction, TransactionType
+from src.incremental import IdWindow, to_cents, to_day
+
+DEFAULT_DUPLICATE_WINDOW_DAYS = 3
+DEFAULT_DUPLICATE_INDEX_DAYS = 90
+DEFAULT_ANOMALY_Z_THRESHOLD = 3.0
+DEFAULT_ANOMALY_MIN_SAMPLES = 10
+DEFAULT_ANOMALY_REFRESH_SECONDS = 1.0
+
+
+def _duplicate_key(from_account_id, to_account_id, amount):
+    return from_account_id, to_account_id, to_cents(amount)
+
+
+def _category_key(transaction_type, income_category_id, expense_category_id):
+    """Категория, по которой ведется статистика сумм; переводы не проверяются"""
+    if transaction_type == TransactionType.INCOME:
+        return transaction_type, income_category_id
+    if transaction_type == TransactionType.EXPENSE:
+        return transaction_type, expense_category_id
+    return None
+
+
+class AnomalyDetector:
+    """Проверка новых операций на дубли и выбросы без запросов по истории.
+
+    Индекс недавних операций: (счет списания, счет зачисления, сумма в копейках)
+    -> список (день, id); дубль — операция с тем же ключом в пределах
+    ±window_days. По каждой категории хранятся количество, среднее и сумма
+    квадратов отклонений (алгоритм Уэлфорда); выброс — отклонение от среднего
+    больше z_threshold стандартных отклонений. Обе структуры загружаются одним
+    разом и дальше обновляются по закоммиченным операциям.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.window_days = DEFAULT_DUPLICATE_WINDOW_DAYS
+        self.index_days = DEFAULT_DUPLICATE_INDEX_DAYS
+        self.z_threshold = DEFAULT_ANOMALY_Z_THRESHOLD
+        self.min_samples = DEFAULT_ANOMALY_MIN_SAMPLES
+        self.refresh_seconds = DEFAULT_ANOMALY_REFRESH_SECONDS
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+            self.window = IdWindow()
+            self.refreshed_at = 0.0
+            self.pruned_day = None
+            self.recent = {}
+            self.stats = {}
+
+    def load(self, connection, uncommitted=()):
+        """Начальная загрузка: статистика по всей истории (включая архив) и операции за index_days"""
+        uncommitted = list(uncommitted)
+        with self.lock:
+            self.reset()
+            for model in (Transaction, ArchivedTransaction):
+                rows = connection.execute(
+                    select(
+                        model.transaction_type, model.income_category_id, model.expense_category_id,
+                        func.count(model.id), func.sum(model.amount), func.sum(model.amount * model.amount)
+                    ).where(
+                        model.transaction_type.in_([TransactionType.INCOME, TransactionType.EXPENSE]),
+                        model.id.notin_(uncommitted)
+                    ).group_by(model.transaction_type, model.income_category_id, model.expense_category_id)
+                )
+                for transaction_type, income_category_id, expense_category_id, count, total, squares in rows:
+                    key = _category_key(transaction_type, income_category_id, expense_category_id)
+                    self._merge_stats(key, count, float(total), float(squares))
+
+            # Все операции окна перекрытия уже учтены в статистике, в том числе старше index_days
+            self.window.seed(connection.execute, uncommitted)
+            since = datetime.utcnow() - timedelta(days=self.index_days)
+            rows = connection.execute(
+                select(
+                    Transaction.id, Transaction.from_account_id, Transaction.to_account_id,
+                    Transaction.amount, Transaction.transaction_date
+                ).where(Transaction.transaction_date >= since, Transaction.id.notin_(uncommitted))
+            )
+            for transaction_id, from_account_id, to_account_id, amount, transaction_date in rows:
+                self._index(transaction_id, _duplicate_key(from_account_id, to_account_id, amount), transaction_date)
+            self.refreshed_at = time.monotonic()
+            self.loaded = True
+
+    def _merge_stats(self, key, count, total, squares):
+        """Добавление агрегата (количество, сумма, сумма квадратов) к статистике категории"""
+        if not count:
+            return
+        mean = total / count
+        m2 = max(squares - total * mean, 0.0)
+        if key not in self.stats:
+            self.stats[key] = [count, mean, m2]
+            return
+        n, current_mean, current_m2 = self.stats[key]
+        delta = mean - current_mean
+        total_count = n + count
+        self.stats[key] = [
+            total_count,
+            current_mean + delta * count / total_count,
+            current_m2 + m2 + delta * delta * n * count / total_count
+        ]
+
+    def _index(self, transaction_id, key, transaction_date):
+        self.recent.setdefault(key, []).append((to_day(transaction_date), transaction_id))
+
+    def add(self, row):
+        """Учет закоммиченной операции: row — снимок полей, сделанный в after_flush"""
+        with self.lock:
+            if not self.loaded or not self.window.add(row['id']):
+                return
+            if row['transaction_date'] >= datetime.utcnow() - timedelta(days=self.index_days):
+                self._index(row['id'], row['duplicate_key'], row['transaction_date'])
+            if row['category_key'] is not None:
+                n, mean, m2 = self.stats.get(row['category_key'], [0, 0.0, 0.0])
+                n += 1
+                delta = row['amount'] - mean
+                mean += delta / n
+                m2 += delta * (row['amount'] - mean)
+                self.stats[row['category_key']] = [n, mean, m2]
+
+    def refresh(self, connection, uncommitted=()):
+        """Догрузка операций других процессов: запрос по первичному ключу не чаще refresh_seconds.
+
+        uncommitted — id операций текущей сессии: соединение сессии уже видит
+        их, но в индекс они попадают только после commit.
+        """
+        with self.lock:
+            if not self.loaded:
+                self.load(connection, uncommitted)
+                return
+            if time.monotonic() - self.refreshed_at < self.refresh_seconds:
+                return
+            rows = connection.execute(
+                select(
+                    Transaction.id, Transaction.transaction_type, Transaction.amount,
+                    Transaction.transaction_date, Transaction.from_account_id, Transaction.to_account_id,
+                    Transaction.income_category_id, Transaction.expense_category_id
+                ).where(self.window.condition())
+            )
+            for row in rows:
+                if row.id not in uncommitted:
+                    self.add(_snapshot(row))
+            self.refreshed_at = time.monotonic()
+            self._prune()
+
+    def _prune(self):
+        today = to_day(datetime.utcnow())
+        if self.pruned_day == today:
+            return
+        horizon = today - self.index_days - self.window_days
+        for key in list(self.recent):
+            entries = [entry for entry in self.recent[key] if entry[0] >= horizon]
+            if entries:
+                self.recent[key] = entries
+            else:
+                del self.recent[key]
+        self.pruned_day = today
+
+    def check(self, row, pending=None):
+        """Признаки аномалии для новой операции (pending — еще не закоммиченные операции той же сессии)"""
+        flags = []
+        day = to_day(row['transaction_date'])
+        with self.lock:
+            entries = list(self.recent.get(row['duplicate_key'], ()))
+            stats = self.stats.get(row['category_key'])
+        if pending:
+            entries += pending.get(row['duplicate_key'], ())
+
+        duplicates = sorted(
+            transaction_id for entry_day, transaction_id in entries
+            if abs(entry_day - day) <= self.window_days and transaction_id != row['id']
+        )
+        if duplicates:
+            flags.append({'type': 'duplicate', 'transaction_ids': duplicates, 'window_days': self.window_days})
+
+        if stats is not None and stats[0] >= self.min_samples:
+            n, mean, m2 = stats
+            std = math.sqrt(m2 / (n - 1))
+            if std > 0:
+                z_score = (row['amount'] - mean) / std
+                if abs(z_score) >= self.z_threshold:
+                    flags.append({
+                        'type': 'outlier',
+                        'z_score': round(z_score, 2),
+                        'category_mean': round(mean, 2),
+                        'category_std': round(std, 2)
+                    })
+        return flags
+
+
+def _snapshot(obj):
+    return {
+        'id': obj.id,
+        'amount': float(obj.amount),
+        'transaction_date': obj.transaction_date,
+        'duplicate_key': _duplicate_key(obj.from_account_id, obj.to_account_id, obj.amount),
+        'category_key': _category_key(obj.transaction_type, obj.income_category_id, obj.expense_category_id)
+    }
+
+
+def _check_new_transactions(session, flush_context):
+    """Проверка вставленных операций; результат сохраняется в атрибуте anomalies объекта"""
+    new = sorted((obj for obj in session.new if isinstance(obj, Transaction)), key=lambda obj: obj.id)
+    if not new:
+        return
+    pending = session.info.setdefault('anomaly_pending', [])
+    detector.refresh(session.connection(), {obj.id for obj in new} | {row['id'] for row in pending})
+
+    pending_index = {}
+    for row in pending:
+        pending_index.setdefault(row['duplicate_key'], []).append((to_day(row['transaction_date']), row['id']))
+    for obj in new:
+        row = _snapshot(obj)
+        obj.anomalies = detector.check(row, pending_index)
+        pending.append(row)
+        pending_index.setdefault(row['duplicate_key'], []).append((to_day(row['transaction_date']), row['id']))
+
+
+def _add_committed(session):
+    for row in session.info.pop('anomaly_pending', ()):
+        detector.add(row)
+
+
+def _discard_pending(session):
+    session.info.pop('anomaly_pending', None)
+
+
+def init_anomalies(app, db):
+    """Проверка всех вставляемых операций (одиночных, пакетных, плановых) на дубли и выбросы"""
+    detector.window_days = app.config.setdefault('DUPLICATE_WINDOW_DAYS', DEFAULT_DUPLICATE_WINDOW_DAYS)
+    detector.index_days = app.config.setdefault('DUPLICATE_INDEX_DAYS', DEFAULT_DUPLICATE_INDEX_DAYS)
+    detector.z_threshold = app.config.setdefault('ANOMALY_Z_THRESHOLD', DEFAULT_ANOMALY_Z_THRESHOLD)
+    detector.min_samples = app.config.setdefault('ANOMALY_MIN_SAMPLES', DEFAULT_ANOMALY_MIN_SAMPLES)
+    detector.refresh_seconds = app.config.setdefault('ANOMALY_REFRESH_SECONDS', DEFAULT_ANOMALY_REFRESH_SECONDS)
+    if event.contains(db.session, 'after_flush', _check_new_transactions):
+        return
+    event.listen(db.session, 'after_flush', _check_new_transactions)
+    event.listen(db.session, 'after_commit', _add_committed)
+    event.listen(db.session, 'after_rollback', _discard_pending)
+
+
+# Детектор процесса
+detector = AnomalyDetector()
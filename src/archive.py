@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, delete, select, and_
+
+from src.models.financial import (
+    db, Transaction, ArchivedTransaction, PlannedTransaction,
+    ClosedPeriod, ArchiveSummary, ArchiveRun
+)
+from src.periods import month_bounds
+
+DEFAULT_ARCHIVE_HORIZON_DAYS = 730
+
+# Колонки, копируемые в архив без изменений
+ARCHIVE_COLUMNS = (
+    'id', 'transaction_type', 'amount', 'description', 'transaction_date', 'created_at',
+    'user_id', 'from_account_id', 'to_account_id', 'income_category_id',
+    'expense_category_id', 'business_direction_id'
+)
+SUMMARY_KEYS = (
+    'user_id', 'transaction_type', 'from_account_id', 'to_account_id',
+    'income_category_id', 'expense_category_id', 'business_direction_id'
+)
+
+
+def archived_periods():
+    """Интервалы [начало, конец) архивированных месяцев"""
+    return db.session.query(ClosedPeriod.period_start, ClosedPeriod.period_end).join(
+        ArchiveRun, ArchiveRun.period_id == ClosedPeriod.id
+    ).order_by(ClosedPeriod.period_start).all()
+
+
+def reaches_archive(start=None, end=None, periods=None):
+    """Пересекается ли интервал [start, end] с архивированными месяцами"""
+    for period_start, period_end in archived_periods() if periods is None else periods:
+        if (start is None or start < period_end) and (end is None or end >= period_start):
+            return True
+    return False
+
+
+def transaction_models(start=None, end=None):
+    """Модели, по которым нужно выполнять запрос для интервала: архив подключается только при необходимости"""
+    if reaches_archive(start, end):
+        return [Transaction, ArchivedTransaction]
+    return [Transaction]
+
+
+def partial_archive_models(start=None, end=None, covered=()):
+    """Модели для открытой части отчета: архив нужен, только если интервал
+    частично захватывает архивированный месяц (целиком покрытые месяцы берутся из итогов)"""
+    covered_starts = {period.period_start for period in covered}
+    periods = [p for p in archived_periods() if p[0] not in covered_starts]
+    if reaches_archive(start, end, periods):
+        return [Transaction, ArchivedTransaction]
+    return [Transaction]
+
+
+def archive_period(period):
+    """Перенос операций одного закрытого месяца в архив с обновлением итогов переноса"""
+    # Операции, на которые ссылаются выполненные плановые операции, остаются в основной таблице
+    referenced = select(PlannedTransaction.completed_transaction_id).where(
+        PlannedTransaction.completed_transaction_id.isnot(None)
+    )
+    condition = and_(
+        Transaction.transaction_date >= period.period_start,
+        Transaction.transaction_date < period.period_end,
+        Transaction.id.notin_(referenced)
+    )
+
+    # Итоги переноса одним группирующим запросом
+    key_columns = [getattr(Transaction, key) for key in SUMMARY_KEYS]
+    groups = db.session.query(
+        *key_columns, func.sum(Transaction.amount), func.count(Transaction.id)
+    ).filter(condition).group_by(*key_columns).all()
+
+    archived_count = sum(row[-1] for row in groups)
+    if archived_count:
+        existing = {
+            tuple(getattr(summary, key) for key in SUMMARY_KEYS): summary
+            for summary in ArchiveSummary.query.all()
+        }
+        for *key, amount, count in groups:
+            summary = existing.get(tuple(key))
+            if summary is None:
+                summary = ArchiveSummary(amount=Decimal('0'), transaction_count=0, **dict(zip(SUMMARY_KEYS, key)))
+                db.session.add(summary)
+                existing[tuple(key)] = summary
+            summary.amount += Decimal(str(amount))
+            summary.transaction_count += count
+
+        # Перенос строк набором: INSERT ... SELECT и DELETE без загрузки объектов
+        columns = [getattr(Transaction, name) for name in ARCHIVE_COLUMNS]
+        db.session.execute(
+            insert(ArchivedTransaction).from_select(
+                list(ARCHIVE_COLUMNS) + ['archived_at'],
+                select(*columns, func.current_timestamp()).where(condition)
+            )
+        )
+        db.session.execute(
+            delete(Transaction).where(condition).execution_options(synchronize_session=False)
+        )
+
+    run = ArchiveRun(period_id=period.id, archived_count=archived_count)
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def archive_transactions(horizon_days=DEFAULT_ARCHIVE_HORIZON_DAYS, now=None):
+    """Архивация операций старше горизонта.
+
+    Переносятся только закрытые месяцы: их итоги уже сохранены, а новые
+    операции в них запрещены, поэтому отчеты по ним не обращаются к архиву.
+    Каждый месяц переносится отдельной транзакцией БД.
+    """
+    now = now or datetime.utcnow()
+    horizon = now - timedelta(days=horizon_days)
+    cutoff, _ = month_bounds(horizon.year, horizon.month)
+
+    periods = ClosedPeriod.query.outerjoin(
+        ArchiveRun, ArchiveRun.period_id == ClosedPeriod.id
+    ).filter(
+        ArchiveRun.id.is_(None),
+        ClosedPeriod.period_end <= cutoff
+    ).order_by(ClosedPeriod.period_start).all()
+
+    return [archive_period(period) for period in periods]
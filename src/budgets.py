@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from sqlalchemy import event, func, update, or_
+
+from src.models.financial import db, Budget, Transaction, TransactionType
+from src.periods import month_bounds
+from src.archive import transaction_models
+
+DEFAULT_BUDGET_ALERT_THRESHOLD = 0.9
+
+# Поля операции, по которым ведется бюджет
+BUDGET_TARGETS = ('income_category_id', 'expense_category_id', 'business_direction_id')
+
+
+def _budget_keys(transaction):
+    if transaction.transaction_type not in (TransactionType.INCOME, TransactionType.EXPENSE):
+        return []
+    date = transaction.transaction_date
+    return [
+        (date.year, date.month, transaction.transaction_type, target, getattr(transaction, target))
+        for target in BUDGET_TARGETS
+        if getattr(transaction, target) is not None
+    ]
+
+
+def _increment_counters(session, flush_context):
+    """Увеличение факта бюджетов в той же транзакции БД, что и вставка операций"""
+    increments = {}
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            for key in _budget_keys(obj):
+                increments[key] = increments.get(key, Decimal('0')) + Decimal(str(obj.amount))
+    if not increments:
+        return
+
+    connection = session.connection()
+    for (year, month, transaction_type, target, target_id), amount in increments.items():
+        # Атомарное UPDATE ... SET actual = actual + :amount, без чтения строк бюджета
+        connection.execute(
+            update(Budget).where(
+                Budget.year == year,
+                Budget.month == month,
+                Budget.transaction_type == transaction_type,
+                getattr(Budget, target) == target_id
+            ).values(actual_amount=Budget.actual_amount + amount)
+        )
+
+
+def budget_alerts(transaction, threshold=DEFAULT_BUDGET_ALERT_THRESHOLD):
+    """Бюджеты операции, израсходованные на threshold и более (один запрос по индексу)"""
+    keys = _budget_keys(transaction)
+    if not keys:
+        return []
+    year, month, transaction_type = keys[0][:3]
+    budgets = Budget.query.filter(
+        Budget.year == year,
+        Budget.month == month,
+        Budget.transaction_type == transaction_type,
+        or_(*[getattr(Budget, target) == target_id for _, _, _, target, target_id in keys]),
+        Budget.actual_amount >= Budget.planned_amount * threshold
+    ).all()
+    return [budget.to_dict() for budget in budgets]
+
+
+def recompute_actual(budget):
+    """Расчет факта бюджета по операциям месяца (при создании бюджета)"""
+    start, end = month_bounds(budget.year, budget.month)
+    target = next(t for t in BUDGET_TARGETS if getattr(budget, t) is not None)
+    actual = Decimal('0')
+    for model in transaction_models(start, end):
+        total = db.session.query(func.coalesce(func.sum(model.amount), 0)).filter(
+            model.transaction_date >= start,
+            model.transaction_date < end,
+            model.transaction_type == budget.transaction_type,
+            getattr(model, target) == getattr(budget, target)
+        ).scalar()
+        actual += Decimal(str(total))
+    budget.actual_amount = actual
+
+
+def init_budgets(app, db):
+    """Подключение счетчиков факта бюджетов к сессии"""
+    app.config.setdefault('BUDGET_ALERT_THRESHOLD', DEFAULT_BUDGET_ALERT_THRESHOLD)
+    if event.contains(db.session, 'after_flush', _increment_counters):
+        return
+    event.listen(db.session, 'after_flush', _increment_counters)
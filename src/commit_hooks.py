@@ -0,0 +1,44 @@
+from sqlalchemy import event
+
+# Зарегистрированные обработчики: (набор таблиц или None, функция)
+_hooks = []
+
+
+def on_commit(callback, tables=None):
+    """Регистрация обработчика, вызываемого после успешного commit.
+
+    Обработчик получает множество имен измененных таблиц и вызывается,
+    только если среди них есть хотя бы одна из tables (None — любые изменения).
+    """
+    _hooks.append((frozenset(tables) if tables else None, callback))
+    return callback
+
+
+def _collect_changes(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            changed.add(table)
+
+
+def _run_hooks(session):
+    changed = session.info.pop('changed_tables', None)
+    if not changed:
+        return
+    for tables, callback in _hooks:
+        if tables is None or tables & changed:
+            callback(changed)
+
+
+def _discard_changes(session):
+    session.info.pop('changed_tables', None)
+
+
+def init_commit_hooks(db):
+    """Подключение отслеживания изменений к сессии Flask-SQLAlchemy"""
+    if event.contains(db.session, 'after_flush', _collect_changes):
+        return
+    event.listen(db.session, 'after_flush', _collect_changes)
+    event.listen(db.session, 'after_commit', _run_hooks)
+    event.listen(db.session, 'after_rollback', _discard_changes)
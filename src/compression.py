@@ -0,0 +1,100 @@
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
+# Настройки по умолчанию, переопределяются через app.config
+DEFAULT_CONFIG = {
+    'COMPRESS_MIMETYPES': ('application/json',),
+    'COMPRESS_MIN_SIZE': 1024,  # байт; маленькие ответы не сжимаем
+    'COMPRESS_LEVEL': 6,  # уровень gzip (1-9)
+    'COMPRESS_BR_QUALITY': 4,  # качество brotli (0-11)
+    'COMPRESS_STREAM_CHUNK': 16 * 1024,
+}
+
+
+def init_compression(app):
+    """Подключение сжатия JSON-ответов API (gzip, brotli при наличии модуля)"""
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    app.after_request(compress_response)
+
+
+def choose_encoding():
+    """Выбор кодировки по заголовку Accept-Encoding клиента"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def _gzip_compressor(level):
+    # wbits=31 — формат gzip с заголовком и контрольной суммой
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+def _brotli_compressor(quality):
+    return brotli.Compressor(quality=quality)
+
+
+def _make_compressor(encoding, config):
+    if encoding == 'br':
+        compressor = _brotli_compressor(config['COMPRESS_BR_QUALITY'])
+        return compressor.process, compressor.finish
+    compressor = _gzip_compressor(config['COMPRESS_LEVEL'])
+    return compressor.compress, compressor.flush
+
+
+def _stream(chunks, encoding, config):
+    """Потоковое сжатие ответа, отдаваемого по частям"""
+    compress, finish = _make_compressor(encoding, config)
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= config['COMPRESS_STREAM_CHUNK']:
+            data = compress(b''.join(buffer))
+            buffer, size = [], 0
+            if data:
+                yield data
+    if buffer:
+        data = compress(b''.join(buffer))
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_response(response):
+    """Сжатие ответа, если клиент поддерживает gzip/brotli и ответ достаточно велик"""
+    config = current_app.config
+
+    if response.mimetype not in config['COMPRESS_MIMETYPES']:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding, config)
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        compress, finish = _make_compressor(encoding, config)
+        response.set_data(compress(data) + finish())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,27 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Сколько секунд запись ждет освобождения блокировки SQLite, прежде чем вернуть "database is locked"
+DEFAULT_SQLITE_BUSY_TIMEOUT = 30
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL: чтения не блокируют запись и не блокируются ею, одновременно пишет одно соединение
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def init_sqlite(app):
+    """Настройки SQLite для нескольких процессов gunicorn (вызывать до db.init_app)"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    timeout = app.config.setdefault('SQLITE_BUSY_TIMEOUT', DEFAULT_SQLITE_BUSY_TIMEOUT)
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('connect_args', {}).setdefault('timeout', timeout)
+    if not event.contains(Engine, 'connect', _configure_sqlite):
+        event.listen(Engine, 'connect', _configure_sqlite)
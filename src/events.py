@@ -0,0 +1,186 @@
+import itertools
+import json
+import queue
+import threading
+import uuid
+from collections import deque
+
+from sqlalchemy import event, inspect
+
+from src.models.financial import Account, Transaction, PlannedTransaction
+
+DEFAULT_CLIENT_QUEUE_SIZE = 100
+DEFAULT_REPLAY_SIZE = 1000
+# Каждое открытое соединение занимает поток воркера gthread (GUNICORN_THREADS, по умолчанию 16):
+# лимит оставляет потоки для обычных запросов
+DEFAULT_MAX_SUBSCRIBERS = 8
+
+
+class Subscription:
+    """Ограниченная очередь событий одного клиента"""
+
+    def __init__(self, user_id, is_admin, max_size):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.queue = queue.Queue(maxsize=max_size)
+
+    def accepts(self, item):
+        # Свои события тоже доставляются (изменения из другой вкладки); события без
+        # владельца, например остатки общих счетов, получают все подписчики
+        owner = item['data'].get('user_id')
+        return self.is_admin or owner is None or owner == self.user_id
+
+    def put(self, item):
+        if not self.accepts(item):
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Клиент не успевает читать: очередь сбрасывается, клиент перезагружает данные
+            self.reset()
+
+    def reset(self):
+        with self.queue.mutex:
+            self.queue.queue.clear()
+        self.queue.put_nowait({'id': None, 'type': 'resync', 'data': {}})
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class EventBroker:
+    """Рассылка событий об изменениях подписчикам внутри процесса"""
+
+    def __init__(self, client_queue_size=DEFAULT_CLIENT_QUEUE_SIZE, replay_size=DEFAULT_REPLAY_SIZE,
+                 max_subscribers=DEFAULT_MAX_SUBSCRIBERS):
+        self.client_queue_size = client_queue_size
+        self.max_subscribers = max_subscribers
+        self._subscriptions = set()
+        self._recent = deque(maxlen=replay_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Идентификатор потока событий процесса: номера событий уникальны только внутри него
+        self.stream_id = uuid.uuid4().hex[:12]
+
+    def reset_stream(self):
+        """Новый поток событий, например в дочернем процессе после fork"""
+        with self._lock:
+            self._subscriptions = set()
+            self._recent.clear()
+            self._ids = itertools.count(1)
+            self.stream_id = uuid.uuid4().hex[:12]
+
+    def subscribe(self, user_id, is_admin, last_event_id=None):
+        """Подписка; при переподключении (Last-Event-ID) досылаются пропущенные события из буфера.
+
+        Возвращает None, если у процесса уже max_subscribers подписчиков (0 — без лимита).
+        """
+        subscription = Subscription(user_id, is_admin, self.client_queue_size)
+        with self._lock:
+            if self.max_subscribers and len(self._subscriptions) >= self.max_subscribers:
+                return None
+            if last_event_id:
+                stream_id, _, number = last_event_id.partition(':')
+                latest = self._recent[-1]['id'] if self._recent else 0
+                oldest = self._recent[0]['id'] if self._recent else latest + 1
+                if stream_id != self.stream_id or not number.isdigit() \
+                        or int(number) > latest or int(number) + 1 < oldest:
+                    # События другого процесса или вытесненные из буфера — только полная перезагрузка
+                    subscription.reset()
+                else:
+                    for item in self._recent:
+                        if item['id'] > int(number):
+                            subscription.put(item)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def format(self, item):
+        """Сериализация события в формат text/event-stream"""
+        lines = []
+        if item['id'] is not None:
+            lines.append(f"id: {self.stream_id}:{item['id']}")
+        lines.append(f"event: {item['type']}")
+        lines.append(f"data: {json.dumps(item['data'], ensure_ascii=False)}")
+        return '\n'.join(lines) + '\n\n'
+
+    def publish(self, event_type, data):
+        with self._lock:
+            item = {'id': next(self._ids), 'type': event_type, 'data': data}
+            self._recent.append(item)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(item)
+
+
+def _balance_changed(account):
+    state = inspect(account)
+    # Остаток, измененный SQL-выражением (current_balance + delta), после flush
+    # истекает и перечитывается из БД при обращении
+    return state.attrs.current_balance.history.has_changes() \
+        or 'current_balance' in state.expired_attributes
+
+
+def _collect_events(session, flush_context):
+    """Снимок изменений после flush: после commit объекты уже истекли"""
+    pending = session.info.setdefault('pending_events', {})
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            pending[('transaction_created', obj.id)] = {
+                'id': obj.id,
+                'transaction_type': obj.transaction_type.value,
+                'amount': float(obj.amount),
+                'description': obj.description,
+                'transaction_date': obj.transaction_date.isoformat(),
+                'user_id': obj.user_id,
+                'from_account_id': obj.from_account_id,
+                'to_account_id': obj.to_account_id,
+                'income_category_id': obj.income_category_id,
+                'expense_category_id': obj.expense_category_id,
+                'business_direction_id': obj.business_direction_id
+            }
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Account) and _balance_changed(obj):
+            pending[('account_balance', obj.id)] = {
+                'account_id': obj.id,
+                'current_balance': float(obj.current_balance)
+            }
+        elif isinstance(obj, PlannedTransaction) and obj.completed_transaction_id \
+                and inspect(obj).attrs.completed_transaction_id.history.has_changes():
+            pending[('planned_completed', obj.id)] = {
+                'id': obj.id,
+                'user_id': obj.user_id,
+                'completed_transaction_id': obj.completed_transaction_id
+            }
+
+
+def _publish_events(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending:
+        return
+    for (event_type, _), data in pending.items():
+        broker.publish(event_type, data)
+
+
+def _discard_events(session):
+    session.info.pop('pending_events', None)
+
+
+def init_events(app, db):
+    """Публикация событий об операциях, остатках и плановых платежах после commit"""
+    broker.client_queue_size = app.config.setdefault('EVENTS_CLIENT_QUEUE_SIZE', DEFAULT_CLIENT_QUEUE_SIZE)
+    broker.max_subscribers = app.config.setdefault('EVENTS_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS)
+    if event.contains(db.session, 'after_flush', _collect_events):
+        return
+    event.listen(db.session, 'after_flush', _collect_events)
+    event.listen(db.session, 'after_commit', _publish_events)
+    event.listen(db.session, 'after_rollback', _discard_events)
+
+
+# Брокер процесса
+broker = EventBroker()
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from src.models.financial import Transaction
+
+EPOCH = date(1970, 1, 1)
+
+# Сколько последних id перечитывается при догрузке: в PostgreSQL операции
+# с меньшим id могут быть закоммичены позже операций с большим id
+REFRESH_OVERLAP = 256
+
+
+def to_day(value):
+    """Дата как число дней от 1970-01-01"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def to_cents(amount):
+    """Сумма в копейках (целое число)"""
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+class IdWindow:
+    """Учтенные операции индекса в памяти, догружаемого по первичному ключу.
+
+    Догрузка читает операции с id > last_id - REFRESH_OVERLAP; id из этого
+    окна, уже учтенные индексом, запоминаются и пропускаются.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.last_id = 0
+        self.ids = set()
+
+    def condition(self, column=Transaction.id):
+        """Условие догрузки: операции начиная с окна перекрытия"""
+        return column > self.last_id - REFRESH_OVERLAP
+
+    def add(self, record_id):
+        """Учет операции; False — она уже учтена"""
+        if record_id in self.ids:
+            return False
+        self.ids.add(record_id)
+        self.last_id = max(self.last_id, record_id)
+        if len(self.ids) > 2 * REFRESH_OVERLAP:
+            self.ids = {i for i in self.ids if i > self.last_id - REFRESH_OVERLAP}
+        return True
+
+    def seed(self, execute, exclude=()):
+        """Состояние после начальной загрузки агрегирующими запросами: учтены все операции до текущего максимума.
+
+        execute — db.session.execute или connection.execute; exclude — id,
+        не вошедшие в загрузку (например, еще не закоммиченные операции сессии).
+        """
+        self.last_id = execute(select(func.coalesce(func.max(Transaction.id), 0))).scalar()
+        self.ids = set(execute(
+            select(Transaction.id).where(self.condition(), Transaction.id.notin_(list(exclude)))
+        ).scalars())
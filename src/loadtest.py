@@ -0,0 +1,363 @@
+"""Нагрузочный тест записи: параллельные операции против gunicorn с несколькими воркерами.
+
+Запуск из корня репозитория:
+
+    python -m src.loadtest --workers 4 --threads 8 --concurrency 32 --duration 30
+
+Тест создает отдельную базу данных (по умолчанию SQLite во временном каталоге,
+либо --database-url), запускает gunicorn, выполняет смесь операций
+(доходы, расходы, переводы, выполнение плановых, чтение отчетов),
+затем останавливает сервер и проверяет, что остаток каждого счета равен
+начальному остатку плюс движение по его операциям (включая архив), а каждая
+плановая операция выполнена не более одного раза и догрузка индексов в памяти
+сразу после их загрузки не учитывает операции повторно. Код возврата 1 — найдены
+расхождения или ответы 5xx.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = 'income=3,expense=3,transfer=2,planned=1,report=1'
+OPERATIONS = ('income', 'expense', 'transfer', 'planned', 'report')
+# Ошибки SQLite/SQLAlchemy, которые ищутся в журнале gunicorn
+LOG_PATTERNS = ('database is locked', 'OperationalError', 'IntegrityError', 'Traceback')
+
+
+def parse_mix(raw):
+    """Разбор смеси операций вида "income=3,expense=3,report=1" в список весов"""
+    weights = {}
+    for part in filter(None, raw.split(',')):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f'Invalid mix entry "{part}"')
+        weights[name] = int(weight)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError('Mix must contain at least one operation with positive weight')
+    return weights
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Client:
+    """HTTP-клиент на urllib: только стандартная библиотека"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def call(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+    def wait_ready(self, deadline):
+        while time.monotonic() < deadline:
+            try:
+                status, _ = self.call('GET', '/api/accounts')
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('Server did not start in time')
+
+
+class LoadTest:
+    def __init__(self, client, mix, amount_range, seed):
+        self.client = client
+        self.operations = [name for name in OPERATIONS if mix.get(name)]
+        self.weights = [mix[name] for name in self.operations]
+        self.amount_range = amount_range
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.results_lock = threading.Lock()
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.statuses = {name: Counter() for name in OPERATIONS}
+        self.errors = Counter()
+        self.planned_completed = 0
+
+    def seed(self, planned_count):
+        """Тестовые справочники и пул плановых операций для выполнения под нагрузкой"""
+        self.client.call('POST', '/api/init-test-data')
+        _, accounts = self.client.call('GET', '/api/accounts')
+        _, income_categories = self.client.call('GET', '/api/income-categories')
+        _, expense_categories = self.client.call('GET', '/api/expense-categories')
+        _, directions = self.client.call('GET', '/api/business-directions')
+        self.account_ids = [account['id'] for account in accounts]
+        self.income_category_ids = [category['id'] for category in income_categories]
+        self.expense_category_ids = [category['id'] for category in expense_categories]
+        self.direction_ids = [direction['id'] for direction in directions]
+
+        self.planned_ids = []
+        planned_date = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+        for _ in range(planned_count):
+            status, planned = self.client.call('POST', '/api/planned-transactions', self._transaction_body(
+                self._choice(('income', 'expense')), planned_date=planned_date
+            ))
+            if status == 201:
+                self.planned_ids.append(planned['id'])
+
+    def _choice(self, values):
+        with self.random_lock:
+            return self.random.choice(values)
+
+    def _amount(self):
+        with self.random_lock:
+            return round(self.random.uniform(*self.amount_range), 2)
+
+    def _transaction_body(self, transaction_type, **extra):
+        body = {'transaction_type': transaction_type, 'amount': self._amount(), **extra}
+        if transaction_type == 'income':
+            body['to_account_id'] = self._choice(self.account_ids)
+            body['income_category_id'] = self._choice(self.income_category_ids)
+        elif transaction_type == 'expense':
+            body['from_account_id'] = self._choice(self.account_ids)
+            body['expense_category_id'] = self._choice(self.expense_category_ids)
+        else:
+            with self.random_lock:
+                body['from_account_id'], body['to_account_id'] = self.random.sample(self.account_ids, 2)
+        body['business_direction_id'] = self._choice(self.direction_ids)
+        body['description'] = f'loadtest {transaction_type}'
+        return body
+
+    def run_one(self):
+        with self.random_lock:
+            operation = self.random.choices(self.operations, self.weights)[0]
+
+        if operation in ('income', 'expense', 'transfer'):
+            method, path, body = 'POST', '/api/transactions', self._transaction_body(operation)
+        elif operation == 'planned':
+            # Одна и та же плановая операция может выполняться параллельно: повторы должны получить 409
+            method, path, body = 'POST', f'/api/planned-transactions/{self._choice(self.planned_ids)}/complete', None
+        else:
+            method, path, body = 'GET', self._choice(('/api/dashboard', '/api/reports/cash-flow')), None
+
+        started = time.perf_counter()
+        try:
+            status, _ = self.client.call(method, path, body)
+        except OSError as error:
+            status = 'error'
+            with self.results_lock:
+                self.errors[type(error).__name__] += 1
+        elapsed = time.perf_counter() - started
+
+        with self.results_lock:
+            self.latencies[operation].append(elapsed)
+            self.statuses[operation][status] += 1
+            if operation == 'planned' and status == 201:
+                self.planned_completed += 1
+
+    def run(self, concurrency, duration, requests_limit):
+        deadline = time.monotonic() + duration
+        counter = itertools.islice(itertools.count(), requests_limit or None)
+        counter_lock = threading.Lock()
+
+        def worker():
+            while time.monotonic() < deadline:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        return
+                self.run_one()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+        return time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def verify(database_url):
+    """Сверка остатков счетов и выполнения плановых операций по данным в БД"""
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import func
+    from src.main import create_app
+    from src.models.financial import db, Account, PlannedTransaction, Transaction
+    from src.periods import _account_movements
+    from src.suggest import prefix_index
+    from src.anomalies import detector
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+    with app.app_context():
+        movements = _account_movements(None, datetime.max)
+        mismatches = []
+        for account in Account.query.order_by(Account.id).all():
+            expected = Decimal(str(account.initial_balance)) + movements.get(account.id, Decimal('0'))
+            actual = Decimal(str(account.current_balance))
+            if abs(expected - actual) > Decimal('0.005'):
+                mismatches.append((account.id, account.name, expected, actual))
+
+        completed = PlannedTransaction.query.filter_by(is_completed=True).count()
+        linked = db.session.query(func.count(func.distinct(PlannedTransaction.completed_transaction_id))).scalar()
+        transactions = Transaction.query.count()
+
+        # Догрузка сразу после начальной загрузки не должна менять индекс: окно перекрытия уже учтено
+        prefix_index.load()
+        loaded = {key: entry['count'] for key, entry in prefix_index.entries.items()}
+        prefix_index.refreshed_at = 0.0
+        prefix_index.refresh()
+        index_mismatches = [
+            ('suggest', key, count, prefix_index.entries[key]['count'])
+            for key, count in loaded.items() if prefix_index.entries[key]['count'] != count
+        ]
+        connection = db.session.connection()
+        detector.load(connection)
+        loaded = {key: stats[0] for key, stats in detector.stats.items()}
+        detector.refreshed_at = 0.0
+        detector.refresh(connection)
+        index_mismatches += [
+            ('anomalies', key, count, detector.stats[key][0])
+            for key, count in loaded.items() if detector.stats[key][0] != count
+        ]
+    return mismatches, completed, linked, transactions, index_mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent write load test for the ledger API')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, default=32, help='parallel client connections')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to run')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests (0 - only duration)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'operation weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--planned', type=int, default=200, help='planned transactions created before the run')
+    parser.add_argument('--min-amount', type=float, default=1)
+    parser.add_argument('--max-amount', type=float, default=5000)
+    parser.add_argument('--database-url', help='database to test against (default: new SQLite file in a temp dir)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for a reproducible operation mix')
+    parser.add_argument('--timeout', type=float, default=30, help='HTTP timeout, seconds')
+    parser.add_argument('--keep', action='store_true', help='keep the temp dir with the database and server log')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='ledger-loadtest-')
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    port = free_port()
+    log_path = os.path.join(workdir, 'gunicorn.log')
+
+    env = dict(os.environ, DATABASE_URL=database_url, PROFILE_SAMPLE_RATE='0')
+    command = [
+        sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '--workers', str(args.workers), '--threads', str(args.threads),
+        '--bind', f'127.0.0.1:{port}', 'src.main:app'
+    ]
+    print(f'Starting gunicorn: {args.workers} workers x {args.threads} threads, database {database_url}')
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        client = Client(f'http://127.0.0.1:{port}', args.timeout)
+        client.wait_ready(time.monotonic() + 30)
+
+        test = LoadTest(client, args.mix, (args.min_amount, args.max_amount), args.seed)
+        test.seed(args.planned if args.mix.get('planned') else 0)
+        if args.mix.get('planned') and not test.planned_ids:
+            raise RuntimeError('Could not create planned transactions')
+        print(f'Running {args.concurrency} concurrent clients for {args.duration:g}s ...')
+        elapsed = test.run(args.concurrency, args.duration, args.requests)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    # Отчет о пропускной способности и задержках
+    total = sum(len(values) for values in test.latencies.values())
+    print(f'\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s')
+    print(f"{'operation':<10} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    for operation in OPERATIONS:
+        values = test.latencies[operation]
+        if not values:
+            continue
+        statuses = ' '.join(f'{status}:{count}' for status, count in sorted(test.statuses[operation].items(), key=str))
+        print(f'{operation:<10} {len(values):>7} '
+              f'{percentile(values, 0.50) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f} '
+              f'{percentile(values, 0.99) * 1000:>8.1f} {max(values) * 1000:>8.1f}  {statuses}')
+    if test.errors:
+        print('client errors: ' + ', '.join(f'{name}: {count}' for name, count in test.errors.items()))
+
+    with open(log_path) as log:
+        server_log = log.read()
+    found = {pattern: len(re.findall(re.escape(pattern), server_log)) for pattern in LOG_PATTERNS}
+    print('server log: ' + ', '.join(f'"{pattern}": {count}' for pattern, count in found.items()))
+
+    # Проверка инвариантов
+    mismatches, completed, linked, transactions, index_mismatches = verify(database_url)
+    failed = False
+    print(f'\n{transactions} transactions in the database')
+    if mismatches:
+        failed = True
+        print('BALANCE MISMATCHES (account, expected initial + net, actual current_balance):')
+        for account_id, name, expected, actual in mismatches:
+            print(f'  #{account_id} {name}: expected {expected}, actual {actual}, diff {actual - expected}')
+    else:
+        print('Balances OK: current_balance = initial_balance + net of transactions for every account')
+
+    if completed != linked or completed != test.planned_completed:
+        failed = True
+        print(f'PLANNED MISMATCH: {completed} completed, {linked} linked transactions, '
+              f'{test.planned_completed} successful completion responses')
+    elif args.mix.get('planned'):
+        print(f'Planned OK: {completed} completed exactly once')
+
+    if index_mismatches:
+        failed = True
+        print('IN-MEMORY INDEX MISMATCHES after refresh (index, key, loaded, refreshed):')
+        for index, key, loaded, refreshed in index_mismatches:
+            print(f'  {index} {key!r}: {loaded} -> {refreshed}')
+    else:
+        print('Indexes OK: refresh right after load does not recount transactions')
+
+    server_errors = sum(
+        count for statuses in test.statuses.values()
+        for status, count in statuses.items() if status == 'error' or status >= 500
+    )
+    if server_errors:
+        failed = True
+        print(f'{server_errors} requests failed with 5xx or connection errors (see {log_path})')
+
+    if args.keep or failed:
+        print(f'Database and server log kept in {workdir}')
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
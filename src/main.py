@@ -3,44 +3,191 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import threading
+import time
+
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.financial import db
+from src.database import init_sqlite
+from src.compression import init_compression
+from src.commit_hooks import init_commit_hooks
+from src.routing import init_routing
+from src.events import broker, init_events
+from src.budgets import init_budgets
+from src.anomalies import detector, init_anomalies
+from src.suggest import init_suggest, prefix_index
+from src.profiling import init_profiling
+from src.archive import DEFAULT_ARCHIVE_HORIZON_DAYS, archive_transactions
+from src.planned import sweep_due_planned
+from src.periods import ensure_period_lock
 from src.routes.user import user_bp
 from src.routes.financial import financial_bp
+from src.routes.batch import batch_bp
+from src.routes.analytics import analytics_bp
+from src.routes.events import events_bp
+from src.routes.profiling import profiling_bp
+
+# Ключ app.extensions с состоянием инициализации базы данных
+INIT_STATE_KEY = 'financial_init'
+
+
+def create_app(config=None):
+    """Создание приложения без обращений к базе данных.
+
+    Схема и индексы в памяти создаются init_database: один раз в мастер-процессе
+    gunicorn при --preload (воркеры наследуют результат при fork) или
+    при первом запросе в каждом процессе без --preload.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # uncomment if you need to use database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', "sqlite:///app.db")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Реплика для чтения (например, postgresql://... или sqlite:///replica.db)
+    if os.environ.get('DATABASE_REPLICA_URL'):
+        app.config['SQLALCHEMY_BINDS'] = {'replica': os.environ['DATABASE_REPLICA_URL']}
+    app.config['READ_YOUR_WRITES_SECONDS'] = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+    # Операции закрытых месяцев старше горизонта переносятся в архив
+    app.config['ARCHIVE_HORIZON_DAYS'] = int(os.environ.get('ARCHIVE_HORIZON_DAYS', DEFAULT_ARCHIVE_HORIZON_DAYS))
+    # Доля запросов, профилируемых выборочно (0 — только по запросу администратора)
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    if config:
+        app.config.update(config)
+
+    # Включение CORS для всех доменов
+    CORS(app)
+
+    # Сжатие JSON-ответов API (gzip/brotli)
+    init_compression(app)
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(financial_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(analytics_bp, url_prefix='/api')
+    app.register_blueprint(events_bp, url_prefix='/api')
+    app.register_blueprint(profiling_bp, url_prefix='/api')
+
+    # Ожидание блокировки и WAL для SQLite: запись из нескольких воркеров без "database is locked"
+    init_sqlite(app)
+    db.init_app(app)
+    # Обработчики сессии регистрируются один раз на процесс, повторные вызовы ничего не делают
+    init_commit_hooks(db)
+    init_routing(app, db)
+    init_events(app, db)
+    init_budgets(app, db)
+    init_anomalies(app, db)
+    init_suggest(app, db)
+
+    app.extensions[INIT_STATE_KEY] = {'done': False, 'lock': threading.Lock(), 'report': {}}
+    app.extensions[INIT_STATE_KEY]['report']['create_app_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    @app.before_request
+    def ensure_database():
+        init_database(app)
+
+    # Профилирование включается после инициализации БД, чтобы не учитывать ее в первом запросе
+    init_profiling(app)
+
+    register_commands(app)
+    register_static(app)
+    return app
+
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Включение CORS для всех доменов
-CORS(app)
-
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(financial_bp, url_prefix='/api')
-
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///app.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+def init_database(app):
+    """Создание схемы и загрузка индексов в памяти; повторные вызовы ничего не делают"""
+    state = app.extensions[INIT_STATE_KEY]
+    if state['done']:
+        return state['report']
+    with state['lock']:
+        if state['done']:
+            return state['report']
+        report = state['report']
+        with app.app_context():
+            started = time.perf_counter()
+            db.create_all()
+            ensure_period_lock()
+            report['schema_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+            # Индекс подсказок строится при старте и дальше обновляется при вставке операций
+            started = time.perf_counter()
+            prefix_index.load()
+            report['suggest_index_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            report['suggest_index_size'] = len(prefix_index.keys)
+
+            # Детектор аномалий загружается до первой вставки, а не внутри ее flush под блокировкой записи
+            started = time.perf_counter()
+            detector.load(db.session.connection())
+            report['anomaly_index_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+            # Соединения, открытые при инициализации, не должны попасть в дочерние процессы:
+            # сессия сначала возвращает свое соединение в пул, иначе dispose его не закроет
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        report['pid'] = os.getpid()
+        state['done'] = True
+    app.logger.info('Startup report: %s', ', '.join(f'{key}={value}' for key, value in report.items()))
+    return report
+
+
+def init_worker(app):
+    """Подготовка процесса после fork (gunicorn post_fork)"""
+    with app.app_context():
+        # Пул соединений мастера не переиспользуется: дочерний процесс открывает свои соединения
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    # Номера событий уникальны только внутри процесса
+    broker.reset_stream()
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Создание схемы базы данных и отчет о времени инициализации"""
+        report = init_database(app)
+        for key, value in report.items():
+            print(f'{key}: {value}')
+
+    @app.cli.command('archive-transactions')
+    def archive_transactions_command():
+        """Архивация операций закрытых месяцев старше ARCHIVE_HORIZON_DAYS"""
+        init_database(app)
+        runs = archive_transactions(app.config['ARCHIVE_HORIZON_DAYS'])
+        for run in runs:
+            print(f'{run.period.year}-{run.period.month:02d}: {run.archived_count} transactions archived')
+
+    @app.cli.command('complete-due-planned')
+    def complete_due_planned_command():
+        """Выполнение всех наступивших плановых операций (повторный запуск безопасен)"""
+        init_database(app)
+        transactions = sweep_due_planned()
+        print(f'{len(transactions)} planned transactions completed')
+
+
+def register_static(app):
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+
+app = create_app()
 
 
 if __name__ == '__main__':
+    init_database(app)
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from enum import Enum
+from src.routing import RoutingSession
 
-db = SQLAlchemy()
+# Сессия с маршрутизацией чтений на реплику (см. src/routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class UserRole(Enum):
     ADMIN = "admin"
@@ -132,7 +134,7 @@ class Transaction(db.Model):
     transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
     amount = db.Column(db.Numeric(15, 2), nullable=False)
     description = db.Column(db.Text)
-    transaction_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    transaction_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Внешние ключи
@@ -221,3 +223,200 @@ class PlannedTransaction(db.Model):
             'business_direction_id': self.business_direction_id
         }
 
+
+class ClosedPeriod(db.Model):
+    """Закрытый месяц: операции в нем запрещены, итоги сохранены"""
+    __tablename__ = 'closed_periods'
+    __table_args__ = (db.UniqueConstraint('year', 'month'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False)
+    period_end = db.Column(db.DateTime, nullable=False)  # начало следующего месяца
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closed_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    # Связи
+    totals = db.relationship('ClosedPeriodTotal', backref='period', lazy=True, cascade='all, delete-orphan')
+    balances = db.relationship('ClosedPeriodBalance', backref='period', lazy=True, cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'year': self.year,
+            'month': self.month,
+            'period_start': self.period_start.isoformat(),
+            'period_end': self.period_end.isoformat(),
+            'closed_at': self.closed_at.isoformat(),
+            'closed_by_id': self.closed_by_id,
+            'total_income': float(sum(t.amount for t in self.totals if t.transaction_type == TransactionType.INCOME)),
+            'total_expense': float(sum(t.amount for t in self.totals if t.transaction_type == TransactionType.EXPENSE)),
+            'balances': [balance.to_dict() for balance in self.balances]
+        }
+
+class ClosedPeriodTotal(db.Model):
+    """Итоги закрытого периода в разрезе пользователя, типа операции, категории и направления"""
+    __tablename__ = 'closed_period_totals'
+
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('closed_periods.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
+    income_category_id = db.Column(db.Integer, db.ForeignKey('income_categories.id'), nullable=True)
+    expense_category_id = db.Column(db.Integer, db.ForeignKey('expense_categories.id'), nullable=True)
+    business_direction_id = db.Column(db.Integer, db.ForeignKey('business_directions.id'), nullable=True)
+    amount = db.Column(db.Numeric(15, 2), nullable=False)
+
+class ClosedPeriodBalance(db.Model):
+    """Остаток счета на конец закрытого периода"""
+    __tablename__ = 'closed_period_balances'
+
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('closed_periods.id'), nullable=False, index=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False)
+    closing_balance = db.Column(db.Numeric(15, 2), nullable=False)
+
+    def to_dict(self):
+        return {
+            'account_id': self.account_id,
+            'closing_balance': float(self.closing_balance)
+        }
+
+class PeriodLock(db.Model):
+    """Единственная строка, на которой согласуются закрытие месяца и вставка операций.
+
+    close_period и создание бюджета захватывают ее монопольно (FOR UPDATE),
+    вставка операций — в разделяемом режиме (FOR SHARE): вставки не мешают
+    друг другу, но не могут пройти, пока считаются итоги месяца.
+    """
+    __tablename__ = 'period_lock'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+class ArchivedTransaction(db.Model):
+    """Операция, перенесенная в архив из таблицы transactions (id сохраняется)"""
+    __tablename__ = 'transactions_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
+    amount = db.Column(db.Numeric(15, 2), nullable=False)
+    description = db.Column(db.Text)
+    transaction_date = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Внешние ключи
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    from_account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
+    to_account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
+    income_category_id = db.Column(db.Integer, db.ForeignKey('income_categories.id'), nullable=True)
+    expense_category_id = db.Column(db.Integer, db.ForeignKey('expense_categories.id'), nullable=True)
+    business_direction_id = db.Column(db.Integer, db.ForeignKey('business_directions.id'), nullable=True)
+
+    # Связи
+    from_account = db.relationship('Account', foreign_keys=[from_account_id])
+    to_account = db.relationship('Account', foreign_keys=[to_account_id])
+    income_category = db.relationship('IncomeCategory')
+    expense_category = db.relationship('ExpenseCategory')
+    business_direction = db.relationship('BusinessDirection')
+
+    to_dict = Transaction.to_dict
+
+class ArchiveSummary(db.Model):
+    """Накопленные итоги архивных операций по счетам и категориям (перенос остатков)"""
+    __tablename__ = 'archive_summaries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
+    from_account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
+    to_account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
+    income_category_id = db.Column(db.Integer, db.ForeignKey('income_categories.id'), nullable=True)
+    expense_category_id = db.Column(db.Integer, db.ForeignKey('expense_categories.id'), nullable=True)
+    business_direction_id = db.Column(db.Integer, db.ForeignKey('business_directions.id'), nullable=True)
+    amount = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'transaction_type': self.transaction_type.value,
+            'from_account_id': self.from_account_id,
+            'to_account_id': self.to_account_id,
+            'income_category_id': self.income_category_id,
+            'expense_category_id': self.expense_category_id,
+            'business_direction_id': self.business_direction_id,
+            'amount': float(self.amount),
+            'transaction_count': self.transaction_count
+        }
+
+class ArchiveRun(db.Model):
+    """Запуск архивации: операции закрытого периода перенесены в архив"""
+    __tablename__ = 'archive_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('closed_periods.id'), nullable=False, unique=True)
+    archived_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Связи
+    period = db.relationship('ClosedPeriod')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'year': self.period.year,
+            'month': self.period.month,
+            'archived_count': self.archived_count,
+            'created_at': self.created_at.isoformat()
+        }
+
+class Budget(db.Model):
+    """Бюджет на месяц по категории или направлению с накопленным фактом"""
+    __tablename__ = 'budgets'
+    __table_args__ = (
+        db.Index('ix_budgets_year_month', 'year', 'month'),
+        # Один бюджет на месяц и объект: заполнен ровно один внешний ключ, NULL в остальных не совпадают
+        db.UniqueConstraint('year', 'month', 'transaction_type', 'income_category_id'),
+        db.UniqueConstraint('year', 'month', 'transaction_type', 'expense_category_id'),
+        db.UniqueConstraint('year', 'month', 'transaction_type', 'business_direction_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
+    planned_amount = db.Column(db.Numeric(15, 2), nullable=False)
+    # Факт обновляется счетчиком при каждой новой операции (см. src/budgets.py)
+    actual_amount = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Внешние ключи: заполняется ровно один
+    income_category_id = db.Column(db.Integer, db.ForeignKey('income_categories.id'), nullable=True)
+    expense_category_id = db.Column(db.Integer, db.ForeignKey('expense_categories.id'), nullable=True)
+    business_direction_id = db.Column(db.Integer, db.ForeignKey('business_directions.id'), nullable=True)
+
+    # Связи
+    income_category = db.relationship('IncomeCategory')
+    expense_category = db.relationship('ExpenseCategory')
+    business_direction = db.relationship('BusinessDirection')
+
+    def to_dict(self):
+        planned = float(self.planned_amount)
+        actual = float(self.actual_amount)
+        target = self.income_category or self.expense_category or self.business_direction
+        return {
+            'id': self.id,
+            'year': self.year,
+            'month': self.month,
+            'transaction_type': self.transaction_type.value,
+            'income_category_id': self.income_category_id,
+            'expense_category_id': self.expense_category_id,
+            'business_direction_id': self.business_direction_id,
+            'name': target.name if target else None,
+            'planned_amount': planned,
+            'actual_amount': actual,
+            'remaining_amount': planned - actual,
+            'percent_used': round(actual / planned * 100, 2) if planned else None
+        }
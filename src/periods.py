@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, and_, or_, not_
+
+from src.models.financial import (
+    db, Account, Transaction, ArchivedTransaction, TransactionType,
+    ClosedPeriod, ClosedPeriodTotal, ClosedPeriodBalance, PeriodLock
+)
+
+PERIOD_LOCK_ID = 1
+
+
+class PeriodError(Exception):
+    """Ошибка закрытия периода или попытка изменить закрытый период"""
+
+
+def month_bounds(year, month):
+    """Начало месяца и начало следующего месяца"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def period_bucket(column, granularity):
+    """SQL-выражение для группировки даты: год (YYYY), месяц (YYYY-MM), неделя (дата понедельника) или день"""
+    if db.engine.dialect.name == 'postgresql':
+        if granularity == 'year':
+            return func.to_char(func.date_trunc('year', column), 'YYYY')
+        if granularity == 'week':
+            return func.to_char(func.date_trunc('week', column), 'YYYY-MM-DD')
+        if granularity == 'day':
+            return func.to_char(column, 'YYYY-MM-DD')
+        return func.to_char(func.date_trunc('month', column), 'YYYY-MM')
+    if granularity == 'year':
+        return func.strftime('%Y', column)
+    if granularity == 'week':
+        return func.date(column, 'weekday 0', '-6 days')
+    if granularity == 'day':
+        return func.date(column)
+    return func.strftime('%Y-%m', column)
+
+
+def ensure_period_lock():
+    """Создание строки блокировки периодов (при инициализации базы данных)"""
+    if db.session.get(PeriodLock, PERIOD_LOCK_ID) is None:
+        db.session.add(PeriodLock(id=PERIOD_LOCK_ID))
+        db.session.commit()
+
+
+def lock_periods(exclusive=False):
+    """Блокировка строки периодов до конца транзакции.
+
+    На PostgreSQL и MySQL закрытие месяца и создание бюджета (exclusive) ждут
+    завершения начатых вставок операций, а вставки — их завершения. SQLite не поддерживает
+    FOR UPDATE, там ту же роль играет блокировка записи: ее берет flush вставки
+    или закрытия до проверки месяца.
+    """
+    db.session.query(PeriodLock.id).filter_by(id=PERIOD_LOCK_ID).with_for_update(read=not exclusive).first()
+
+
+def lock_date():
+    """Граница запрета изменений: конец последнего закрытого месяца.
+
+    Открытые месяцы раньше нее тоже закрыты для операций: иначе остатки
+    на конец последнего закрытого месяца, от которых считается следующее
+    закрытие, перестали бы совпадать с операциями.
+    """
+    return db.session.query(func.max(ClosedPeriod.period_end)).scalar()
+
+
+def is_period_closed(date):
+    locked_until = lock_date()
+    return locked_until is not None and date < locked_until
+
+
+def ensure_period_open(date):
+    """Запрет операций, датированных закрытым месяцем или более ранней датой"""
+    if is_period_closed(date):
+        raise PeriodError(f'Period {date.year}-{date.month:02d} is closed')
+
+
+def covered_periods(start_date=None, end_date=None):
+    """Закрытые периоды, целиком попадающие в интервал [start_date, end_date]"""
+    query = ClosedPeriod.query
+    if start_date:
+        query = query.filter(ClosedPeriod.period_start >= start_date)
+    if end_date:
+        # Фильтры отчетов включают end_date, месяц покрыт, если его последний момент <= end_date
+        query = query.filter(ClosedPeriod.period_end <= end_date + timedelta(microseconds=1))
+    return query.order_by(ClosedPeriod.period_start).all()
+
+
+def exclude_periods(query, periods, column=Transaction.transaction_date):
+    """Исключение из запроса операций, попадающих в закрытые периоды"""
+    if not periods:
+        return query
+
+    # Соседние месяцы объединяются в один интервал
+    intervals = []
+    for period in periods:
+        if intervals and intervals[-1][1] == period.period_start:
+            intervals[-1][1] = period.period_end
+        else:
+            intervals.append([period.period_start, period.period_end])
+
+    return query.filter(not_(or_(*[
+        and_(column >= start, column < end)
+        for start, end in intervals
+    ])))
+
+
+def frozen_totals_query(periods, *columns, user_id=None):
+    """Запрос к сохраненным итогам закрытых периодов"""
+    query = db.session.query(*columns).filter(
+        ClosedPeriodTotal.period_id.in_([period.id for period in periods])
+    )
+    if user_id is not None:
+        query = query.filter(ClosedPeriodTotal.user_id == user_id)
+    return query
+
+
+def _account_movements(start, end):
+    """Чистое движение по счетам за интервал [start, end) (start=None — с начала учета, включая архив)"""
+    movements = {}
+    models = [Transaction] if start is not None else [Transaction, ArchivedTransaction]
+    for model in models:
+        def window(query):
+            if start is not None:
+                query = query.filter(model.transaction_date >= start)
+            return query.filter(model.transaction_date < end)
+
+        credits = window(db.session.query(model.to_account_id, func.sum(model.amount)).filter(
+            model.to_account_id.isnot(None),
+            model.transaction_type.in_([TransactionType.INCOME, TransactionType.TRANSFER])
+        )).group_by(model.to_account_id).all()
+        debits = window(db.session.query(model.from_account_id, func.sum(model.amount)).filter(
+            model.from_account_id.isnot(None),
+            model.transaction_type.in_([TransactionType.EXPENSE, TransactionType.TRANSFER])
+        )).group_by(model.from_account_id).all()
+
+        for account_id, amount in credits:
+            movements[account_id] = movements.get(account_id, Decimal('0')) + Decimal(str(amount))
+        for account_id, amount in debits:
+            movements[account_id] = movements.get(account_id, Decimal('0')) - Decimal(str(amount))
+    return movements
+
+
+def close_period(year, month, user):
+    """Закрытие месяца: сохранение итогов и остатков на конец периода"""
+    start, end = month_bounds(year, month)
+    if end > datetime.utcnow():
+        raise PeriodError('Only finished months can be closed')
+    # Итоги считаются после завершения вставок, начатых до закрытия
+    lock_periods(exclusive=True)
+    if ClosedPeriod.query.filter_by(year=year, month=month).first():
+        raise PeriodError(f'Period {year}-{month:02d} is already closed')
+
+    period = ClosedPeriod(year=year, month=month, period_start=start, period_end=end, closed_by_id=user.id)
+    db.session.add(period)
+    db.session.flush()
+
+    # Итоги за месяц одним группирующим запросом
+    rows = db.session.query(
+        Transaction.user_id,
+        Transaction.transaction_type,
+        Transaction.income_category_id,
+        Transaction.expense_category_id,
+        Transaction.business_direction_id,
+        func.sum(Transaction.amount)
+    ).filter(
+        Transaction.transaction_date >= start,
+        Transaction.transaction_date < end
+    ).group_by(
+        Transaction.user_id,
+        Transaction.transaction_type,
+        Transaction.income_category_id,
+        Transaction.expense_category_id,
+        Transaction.business_direction_id
+    ).all()
+
+    for user_id, transaction_type, income_category_id, expense_category_id, business_direction_id, amount in rows:
+        db.session.add(ClosedPeriodTotal(
+            period_id=period.id,
+            user_id=user_id,
+            transaction_type=transaction_type,
+            income_category_id=income_category_id,
+            expense_category_id=expense_category_id,
+            business_direction_id=business_direction_id,
+            amount=Decimal(str(amount))
+        ))
+
+    # Остатки: от остатков предыдущего закрытого месяца, если он есть, иначе от начальных
+    previous_start, _ = month_bounds(year - 1, 12) if month == 1 else month_bounds(year, month - 1)
+    previous = ClosedPeriod.query.filter_by(period_start=previous_start).first()
+    opening = {b.account_id: b.closing_balance for b in previous.balances} if previous else {}
+    movements = _account_movements(start, end) if opening else {}
+    full_movements = None
+
+    for account in Account.query.all():
+        if account.id in opening:
+            closing_balance = opening[account.id] + movements.get(account.id, Decimal('0'))
+        else:
+            if full_movements is None:
+                full_movements = _account_movements(None, end)
+            closing_balance = account.initial_balance + full_movements.get(account.id, Decimal('0'))
+        db.session.add(ClosedPeriodBalance(
+            period_id=period.id,
+            account_id=account.id,
+            closing_balance=closing_balance
+        ))
+
+    db.session.commit()
+    return period
@@ -0,0 +1,111 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from src.models.financial import db, Account, Transaction, PlannedTransaction, TransactionType
+from src.periods import lock_periods
+
+
+def balance_deltas(transactions):
+    """Суммарное изменение остатка по каждому счету для набора операций"""
+    deltas = {}
+    for transaction in transactions:
+        amount = Decimal(str(transaction.amount))
+        if transaction.transaction_type == TransactionType.INCOME and transaction.to_account_id:
+            deltas[transaction.to_account_id] = deltas.get(transaction.to_account_id, Decimal('0')) + amount
+        elif transaction.transaction_type == TransactionType.EXPENSE and transaction.from_account_id:
+            deltas[transaction.from_account_id] = deltas.get(transaction.from_account_id, Decimal('0')) - amount
+        elif transaction.transaction_type == TransactionType.TRANSFER:
+            if transaction.from_account_id:
+                deltas[transaction.from_account_id] = deltas.get(transaction.from_account_id, Decimal('0')) - amount
+            if transaction.to_account_id:
+                deltas[transaction.to_account_id] = deltas.get(transaction.to_account_id, Decimal('0')) + amount
+    return deltas
+
+
+def apply_balance_deltas(deltas):
+    """Применение изменений остатков: одно обновление на счет, без commit.
+
+    Остаток изменяется в SQL (UPDATE ... SET current_balance = current_balance + :delta),
+    а не по прочитанному значению, поэтому параллельные операции по одному
+    счету из разных процессов не теряют обновления.
+    """
+    if not deltas:
+        return
+    accounts = Account.query.filter(Account.id.in_(list(deltas))).all()
+    for account in accounts:
+        account.current_balance = Account.current_balance + deltas[account.id]
+
+
+def complete_planned(candidate_ids, transaction_date=None):
+    """Выполнение плановых операций одним commit.
+
+    Плановые операции сначала захватываются условным UPDATE (is_completed
+    false -> true), поэтому повторный или параллельный запуск не создаст
+    вторую операцию: уже выполненные строки просто пропускаются.
+    Возвращает созданные операции.
+    """
+    candidate_ids = list(candidate_ids)
+    if not candidate_ids:
+        return []
+    transaction_date = transaction_date or datetime.utcnow()
+
+    # Вставка операций не должна пройти во время закрытия месяца или создания бюджета
+    lock_periods()
+    db.session.execute(
+        update(PlannedTransaction).where(
+            PlannedTransaction.id.in_(candidate_ids),
+            PlannedTransaction.is_completed == False
+        ).values(is_completed=True).execution_options(synchronize_session=False)
+    )
+    # Захваченные этим запуском строки: выполнены, но еще без ссылки на операцию
+    claimed = PlannedTransaction.query.filter(
+        PlannedTransaction.id.in_(candidate_ids),
+        PlannedTransaction.is_completed == True,
+        PlannedTransaction.completed_transaction_id.is_(None)
+    ).populate_existing().order_by(PlannedTransaction.planned_date).all()
+    if not claimed:
+        db.session.rollback()
+        return []
+
+    transactions = [
+        Transaction(
+            transaction_type=planned.transaction_type,
+            amount=planned.amount,
+            description=planned.description,
+            transaction_date=transaction_date,
+            user_id=planned.user_id,
+            from_account_id=planned.from_account_id,
+            to_account_id=planned.to_account_id,
+            income_category_id=planned.income_category_id,
+            expense_category_id=planned.expense_category_id,
+            business_direction_id=planned.business_direction_id
+        )
+        for planned in claimed
+    ]
+    db.session.add_all(transactions)
+    db.session.flush()  # Пакетная вставка, получаем ID операций
+
+    for planned, transaction in zip(claimed, transactions):
+        planned.completed_transaction_id = transaction.id
+
+    apply_balance_deltas(balance_deltas(transactions))
+    db.session.commit()
+    return transactions
+
+
+def due_planned_ids(now=None, user_id=None):
+    """ID невыполненных плановых операций, срок которых наступил"""
+    query = db.session.query(PlannedTransaction.id).filter(
+        PlannedTransaction.is_completed == False,
+        PlannedTransaction.planned_date <= (now or datetime.utcnow())
+    )
+    if user_id is not None:
+        query = query.filter(PlannedTransaction.user_id == user_id)
+    return [planned_id for planned_id, in query.all()]
+
+
+def sweep_due_planned(now=None):
+    """Выполнение всех просроченных и наступивших плановых операций (для запуска по расписанию)"""
+    return complete_planned(due_planned_ids(now), now)
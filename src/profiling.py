@@ -0,0 +1,233 @@
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.models.financial import UserRole
+from src.routes.financial import get_current_user
+
+DEFAULT_PROFILE_HEADER = 'X-Profile'
+DEFAULT_PROFILE_QUERY_ARG = 'profile'
+DEFAULT_PROFILE_SAMPLE_RATE = 0.0
+DEFAULT_PROFILE_KEEP = 20
+TOP_FUNCTIONS = 25
+TOP_STATEMENTS = 10
+
+# Имя функций сериализации моделей
+SERIALIZATION_FUNCTION = 'to_dict'
+
+# Профиль, собираемый в текущем потоке (запросы обслуживаются потоками gthread)
+_local = threading.local()
+
+
+class RequestProfile:
+    """Замеры одного запроса: cProfile и время SQL-запросов по событиям движка"""
+
+    def __init__(self, reason):
+        self.reason = reason
+        self.profiler = cProfile.Profile()
+        self.started_at = datetime.utcnow()
+        self.sql_seconds = 0.0
+        self.sql_in_serialization_seconds = 0.0
+        self.statements = {}
+        self.query_count = 0
+        self._query_started = None
+        self._wall_started = None
+
+    def start(self):
+        _local.profile = self
+        self._wall_started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.wall_seconds = time.perf_counter() - self._wall_started
+        _local.profile = None
+
+    def before_query(self):
+        self._query_started = time.perf_counter()
+
+    def after_query(self, statement):
+        elapsed = time.perf_counter() - self._query_started
+        self.sql_seconds += elapsed
+        self.query_count += 1
+        count, total = self.statements.get(statement, (0, 0.0))
+        self.statements[statement] = (count + 1, total + elapsed)
+        # Ленивые загрузки внутри to_dict относятся к SQL, а не к сериализации
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_code.co_name == SERIALIZATION_FUNCTION:
+                self.sql_in_serialization_seconds += elapsed
+                break
+            frame = frame.f_back
+
+    def summary(self):
+        """Разбивка времени: SQL, сериализация (to_dict без SQL), остальной Python"""
+        self.profiler.create_stats()
+        stats = self.profiler.stats
+
+        # Время верхнеуровневых вызовов to_dict: вложенные вызовы (счет внутри операции) не суммируются дважды
+        serialization = 0.0
+        for (_, _, name), (_, _, _, _, callers) in stats.items():
+            if name != SERIALIZATION_FUNCTION:
+                continue
+            for caller, (_, _, _, cumulative) in callers.items():
+                if caller[2] != SERIALIZATION_FUNCTION:
+                    serialization += cumulative
+        serialization = max(serialization - self.sql_in_serialization_seconds, 0.0)
+        python = max(self.wall_seconds - self.sql_seconds - serialization, 0.0)
+
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+
+        return {
+            'reason': self.reason,
+            'started_at': self.started_at.isoformat(),
+            'total_ms': round(self.wall_seconds * 1000, 2),
+            'sql_ms': round(self.sql_seconds * 1000, 2),
+            'serialization_ms': round(serialization * 1000, 2),
+            'python_ms': round(python * 1000, 2),
+            'query_count': self.query_count,
+            'top_statements': [
+                {'statement': statement, 'count': count, 'total_ms': round(total * 1000, 2)}
+                for statement, (count, total) in statements[:TOP_STATEMENTS]
+            ],
+            'top_functions': output.getvalue()
+        }
+
+    def dump(self):
+        """Статистика в формате файлов pstats (для snakeviz, python -m pstats)"""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+
+class ProfileStore:
+    """Последние профили по каждому эндпоинту"""
+
+    def __init__(self, keep=DEFAULT_PROFILE_KEEP):
+        self.keep = keep
+        self._by_endpoint = {}
+        self._by_id = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, method, path, status, summary, data):
+        with self._lock:
+            profile_id = next(self._ids)
+            entry = {
+                'id': profile_id,
+                'endpoint': endpoint,
+                'method': method,
+                'path': path,
+                'status': status,
+                **summary
+            }
+            profiles = self._by_endpoint.setdefault(endpoint, deque())
+            profiles.append(profile_id)
+            self._by_id[profile_id] = (entry, data)
+            while len(profiles) > self.keep:
+                self._by_id.pop(profiles.popleft(), None)
+            return profile_id
+
+    def list(self):
+        """Краткие сведения о сохраненных профилях, сгруппированные по эндпоинтам"""
+        with self._lock:
+            return {
+                endpoint: [
+                    {key: value for key, value in self._by_id[profile_id][0].items()
+                     if key not in ('top_functions', 'top_statements')}
+                    for profile_id in reversed(profiles)
+                ]
+                for endpoint, profiles in self._by_endpoint.items()
+            }
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._by_id.get(profile_id)
+
+
+def _requested(config):
+    """Профилирование явно запрошено заголовком или параметром запроса"""
+    return request.headers.get(config['PROFILE_HEADER']) == '1' \
+        or request.args.get(config['PROFILE_QUERY_ARG']) == '1'
+
+
+def _is_admin():
+    return get_current_user().role == UserRole.ADMIN
+
+
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.before_query()
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.after_query(statement)
+
+
+def init_profiling(app):
+    """Профилирование запросов по требованию администратора или выборочно (PROFILE_SAMPLE_RATE)"""
+    app.config.setdefault('PROFILE_HEADER', DEFAULT_PROFILE_HEADER)
+    app.config.setdefault('PROFILE_QUERY_ARG', DEFAULT_PROFILE_QUERY_ARG)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', DEFAULT_PROFILE_SAMPLE_RATE)
+    profile_store.keep = app.config.setdefault('PROFILE_KEEP', DEFAULT_PROFILE_KEEP)
+
+    @app.before_request
+    def start_profile():
+        config = app.config
+        if _requested(config):
+            if not _is_admin():
+                return
+            reason = 'requested'
+        elif config['PROFILE_SAMPLE_RATE'] and random.random() < config['PROFILE_SAMPLE_RATE']:
+            reason = 'sampled'
+        else:
+            return
+        g.profile = RequestProfile(reason)
+        g.profile.start()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profile.stop()
+        # Запрос не сопоставлен ни с одним эндпоинтом (404, 405): сохранять его профиль не под чем
+        if request.endpoint is None:
+            return response
+        profile_id = profile_store.add(
+            request.endpoint, request.method, request.full_path.rstrip('?'),
+            response.status_code, profile.summary(), profile.dump()
+        )
+        response.headers['X-Profile-Id'] = str(profile_id)
+        return response
+
+    @app.teardown_request
+    def discard_profile(error=None):
+        # Запрос завершился исключением до after_request
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.stop()
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_query):
+        event.listen(Engine, 'before_cursor_execute', _before_query)
+        event.listen(Engine, 'after_cursor_execute', _after_query)
+
+
+# Хранилище профилей процесса
+profile_store = ProfileStore()
@@ -0,0 +1,63 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from src.models.financial import UserRole
+from src.routes.financial import get_current_user
+from src.routing import read_only
+from src.analytics import (
+    DIMENSIONS, MEASURES, PivotError, column_store,
+    format_pivot, parse_filters, sql_pivot
+)
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# API для аналитики
+@analytics_bp.route('/analytics/pivot', methods=['GET'])
+@read_only
+def analytics_pivot():
+    """Произвольная сводная таблица по операциям.
+
+    Параметры: rows и cols — измерения (type, year, month, week, day, user,
+    from_account, to_account, income_category, expense_category, direction),
+    measure — sum, count или avg, filters — "type:expense;direction:1,2",
+    start_date/end_date — границы периода с точностью до дня.
+    """
+    user = get_current_user()
+    rows = request.args.get('rows', 'month')
+    cols = request.args.get('cols') or None
+    measure = request.args.get('measure', 'sum')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if rows not in DIMENSIONS or (cols is not None and cols not in DIMENSIONS):
+        return jsonify({'error': f'Dimensions must be one of: {", ".join(DIMENSIONS)}'}), 400
+    if measure not in MEASURES:
+        return jsonify({'error': f'Measure must be one of: {", ".join(MEASURES)}'}), 400
+
+    try:
+        filters = parse_filters(request.args.get('filters'))
+        start = datetime.fromisoformat(start_date).date() if start_date else None
+        end = datetime.fromisoformat(end_date).date() if end_date else None
+        user_id = user.id if user.role != UserRole.ADMIN else None
+
+        if current_app.config.get('ANALYTICS_CACHE_ENABLED', True):
+            column_store.warm(current_app._get_current_object())
+        if column_store.ready:
+            column_store.refresh()
+            cells = column_store.pivot(rows, cols, filters, start, end, user_id)
+            source = 'cache'
+        else:
+            cells = sql_pivot(rows, cols, filters, start, end, user_id)
+            source = 'sql'
+    except (PivotError, ValueError) as error:
+        return jsonify({'error': str(error)}), 400
+
+    result = format_pivot(cells, measure)
+    if cols is None:
+        result['columns'] = ['total']
+    result.update({
+        'source': source,
+        'rows_dimension': rows,
+        'columns_dimension': cols,
+        'measure': measure
+    })
+    return jsonify(result)
@@ -0,0 +1,77 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from werkzeug.exceptions import HTTPException
+from src.models.financial import db
+
+batch_bp = Blueprint('batch', __name__)
+
+# Максимальное число подзапросов в одном пакете
+DEFAULT_BATCH_MAX_REQUESTS = 20
+# Методы и блюпринты, доступные через пакетный запрос
+BATCH_METHODS = ('GET', 'POST')
+BATCH_BLUEPRINTS = ('financial',)
+
+
+def _response_body(response):
+    if response.is_json:
+        return response.get_json()
+    return response.get_data(as_text=True) or None
+
+
+def execute_subrequest(item, url_prefix):
+    """Выполнение одного подзапроса в текущем контексте приложения.
+
+    Подзапросы используют общую сессию БД и общий кэш текущего пользователя
+    (g), поэтому не платят повторно за диспетчеризацию Flask и поиск пользователя.
+    """
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in BATCH_METHODS or not path or not path.startswith('/'):
+        return {'status': 400, 'body': {'error': 'Invalid sub-request'}}
+
+    with current_app.test_request_context(
+        url_prefix + path,
+        method=method,
+        query_string=item.get('params'),
+        json=item.get('body') if method == 'POST' else None
+    ):
+        if request.routing_exception is not None:
+            error = request.routing_exception
+            return {'status': getattr(error, 'code', 404), 'body': {'error': error.description}}
+        if request.blueprint not in BATCH_BLUEPRINTS:
+            return {'status': 404, 'body': {'error': 'Endpoint is not available in batch'}}
+
+        view = current_app.view_functions[request.endpoint]
+        try:
+            response = current_app.make_response(view(**request.view_args))
+        except HTTPException as error:
+            db.session.rollback()
+            return {'status': error.code, 'body': {'error': error.description}}
+        except Exception as error:
+            db.session.rollback()
+            current_app.logger.exception('Batch sub-request %s %s failed', method, path)
+            return {'status': 500, 'body': {'error': str(error)}}
+
+        return {'status': response.status_code, 'body': _response_body(response)}
+
+
+# API для пакетных запросов
+@batch_bp.route('/batch', methods=['POST'])
+def batch():
+    """Выполнение нескольких запросов к API за один HTTP-запрос.
+
+    Формат: {"requests": [{"method": "GET", "path": "/accounts", "params": {...}, "body": {...}}]}
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list):
+        return jsonify({'error': 'Field "requests" must be a list'}), 400
+
+    max_requests = current_app.config.get('BATCH_MAX_REQUESTS', DEFAULT_BATCH_MAX_REQUESTS)
+    if len(items) > max_requests:
+        return jsonify({'error': f'Too many sub-requests (max {max_requests})'}), 400
+
+    # Подзапросы разделяют сессию БД, поэтому в пакете чтения не уходят на реплику
+    g.force_primary = True
+    url_prefix = request.path.rsplit('/batch', 1)[0]
+    responses = [execute_subrequest(item if isinstance(item, dict) else {}, url_prefix) for item in items]
+    return jsonify({'responses': responses})
@@ -0,0 +1,41 @@
+import queue
+from flask import Blueprint, Response, jsonify, request, current_app
+from src.models.financial import UserRole
+from src.routes.financial import get_current_user
+from src.events import broker
+
+events_bp = Blueprint('events', __name__)
+
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+# API для потока событий (Server-Sent Events)
+@events_bp.route('/events', methods=['GET'])
+def stream_events():
+    """Поток событий: transaction_created, account_balance, planned_completed, resync"""
+    user = get_current_user()
+    subscription = broker.subscribe(
+        user.id, user.role == UserRole.ADMIN, request.headers.get('Last-Event-ID')
+    )
+    if subscription is None:
+        # Клиент продолжает работать без потока, данные обновляются из ответов API
+        return jsonify({'error': 'Too many event subscribers'}), 503
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    item = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Комментарий держит соединение открытым через прокси
+                    yield ': keep-alive\n\n'
+                    continue
+                yield broker.format(item)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,43 +1,74 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, current_app
 from src.models.financial import (
     db, User, Account, IncomeCategory, ExpenseCategory, 
     BusinessDirection, Transaction, PlannedTransaction,
-    TransactionType, AccountType, UserRole
+    TransactionType, AccountType, UserRole,
+    ClosedPeriod, ClosedPeriodTotal, ArchiveRun, ArchiveSummary, Budget
 )
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case
+from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
+from src.cache import TTLCache
+from src.routing import primary, read_only
+from src.planned import apply_balance_deltas, balance_deltas, complete_planned, due_planned_ids
+from src.budgets import budget_alerts, recompute_actual
+from src.suggest import DEFAULT_SUGGEST_LIMIT, MAX_SUGGEST_LIMIT, SUGGEST_FIELDS, prefix_index
+from src.commit_hooks import on_commit
+from src.periods import (
+    PeriodError, close_period, covered_periods, ensure_period_open, lock_periods,
+    exclude_periods, frozen_totals_query, period_bucket
+)
+from src.archive import (
+    DEFAULT_ARCHIVE_HORIZON_DAYS, archive_transactions,
+    partial_archive_models, transaction_models
+)
 
 financial_bp = Blueprint('financial', __name__)
 
+# Кэш сводки дашборда по пользователям; сбрасывается при любых изменениях данных
+DASHBOARD_CACHE_TTL = 30  # секунд
+dashboard_cache = TTLCache(ttl=DASHBOARD_CACHE_TTL)
+on_commit(
+    lambda tables: dashboard_cache.clear(),
+    tables={'transactions', 'planned_transactions', 'accounts', 'expense_categories'}
+)
+
 # Утилитарные функции
 def get_current_user():
-    """Заглушка для получения текущего пользователя. В реальном приложении здесь будет аутентификация."""
+    """Заглушка для получения текущего пользователя. В реальном приложении здесь будет аутентификация.
+
+    Пользователь кэшируется в контексте приложения, поэтому пакетный запрос
+    выполняет поиск один раз для всех подзапросов.
+    """
+    if 'current_user' in g:
+        return g.current_user
     user = User.query.first()
     if not user:
-        # Создаем тестового пользователя-администратора
-        user = User(
-            username='admin',
-            email='admin@example.com',
-            password_hash='hashed_password',
-            role=UserRole.ADMIN
-        )
-        db.session.add(user)
-        db.session.commit()
+        # Реплика могла быть скопирована до появления пользователя: проверка повторяется в основной БД
+        with primary():
+            user = User.query.first()
+            if not user:
+                # Создаем тестового пользователя-администратора
+                user = User(
+                    username='admin',
+                    email='admin@example.com',
+                    password_hash='hashed_password',
+                    role=UserRole.ADMIN
+                )
+                db.session.add(user)
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    # Пользователь создан параллельным запросом
+                    db.session.rollback()
+                    user = User.query.first()
+    g.current_user = user
     return user
 
-def update_account_balance(account_id, amount, operation='add'):
-    """Обновление баланса счета"""
-    account = Account.query.get(account_id)
-    if account:
-        if operation == 'add':
-            account.current_balance += Decimal(str(amount))
-        elif operation == 'subtract':
-            account.current_balance -= Decimal(str(amount))
-        db.session.commit()
-
 # API для счетов
 @financial_bp.route('/accounts', methods=['GET'])
+@read_only
 def get_accounts():
     accounts = Account.query.filter_by(is_active=True).all()
     return jsonify([account.to_dict() for account in accounts])
@@ -79,6 +110,7 @@ def delete_account(account_id):
 
 # API для категорий доходов
 @financial_bp.route('/income-categories', methods=['GET'])
+@read_only
 def get_income_categories():
     categories = IncomeCategory.query.filter_by(is_active=True).all()
     return jsonify([category.to_dict() for category in categories])
@@ -99,6 +131,7 @@ def create_income_category():
 
 # API для категорий расходов
 @financial_bp.route('/expense-categories', methods=['GET'])
+@read_only
 def get_expense_categories():
     categories = ExpenseCategory.query.filter_by(is_active=True).all()
     return jsonify([category.to_dict() for category in categories])
@@ -119,6 +152,7 @@ def create_expense_category():
 
 # API для направлений деятельности
 @financial_bp.route('/business-directions', methods=['GET'])
+@read_only
 def get_business_directions():
     directions = BusinessDirection.query.filter_by(is_active=True).all()
     return jsonify([direction.to_dict() for direction in directions])
@@ -136,6 +170,7 @@ def create_business_direction():
 
 # API для транзакций
 @financial_bp.route('/transactions', methods=['GET'])
+@read_only
 def get_transactions():
     user = get_current_user()
     
@@ -145,25 +180,35 @@ def get_transactions():
     transaction_type = request.args.get('transaction_type')
     account_id = request.args.get('account_id')
     
-    query = Transaction.query
-    
-    # Если пользователь не администратор, показываем только его транзакции
-    if user.role != UserRole.ADMIN:
-        query = query.filter_by(user_id=user.id)
-    
-    if start_date:
-        query = query.filter(Transaction.transaction_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Transaction.transaction_date <= datetime.fromisoformat(end_date))
-    if transaction_type:
-        query = query.filter_by(transaction_type=TransactionType(transaction_type))
-    if account_id:
-        query = query.filter(or_(
-            Transaction.from_account_id == account_id,
-            Transaction.to_account_id == account_id
-        ))
-    
-    transactions = query.order_by(Transaction.transaction_date.desc()).all()
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+    
+    # Архив подключается, только если период запроса его захватывает
+    transactions = []
+    models = transaction_models(start, end)
+    for model in models:
+        query = model.query
+        
+        # Если пользователь не администратор, показываем только его транзакции
+        if user.role != UserRole.ADMIN:
+            query = query.filter_by(user_id=user.id)
+        
+        if start:
+            query = query.filter(model.transaction_date >= start)
+        if end:
+            query = query.filter(model.transaction_date <= end)
+        if transaction_type:
+            query = query.filter_by(transaction_type=TransactionType(transaction_type))
+        if account_id:
+            query = query.filter(or_(
+                model.from_account_id == account_id,
+                model.to_account_id == account_id
+            ))
+        
+        transactions.extend(query.order_by(model.transaction_date.desc()).all())
+    
+    if len(models) > 1:
+        transactions.sort(key=lambda t: t.transaction_date, reverse=True)
     return jsonify([transaction.to_dict() for transaction in transactions])
 
 @financial_bp.route('/transactions', methods=['POST'])
@@ -184,25 +229,41 @@ def create_transaction():
         business_direction_id=data.get('business_direction_id')
     )
     
+    try:
+        ensure_period_open(transaction.transaction_date)
+    except PeriodError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    # Блокировка до flush: счетчики бюджетов обновляются при flush, и бюджет, создаваемый
+    # параллельно, должен либо учесть операцию в начальном факте, либо уже существовать
+    lock_periods()
     db.session.add(transaction)
+    db.session.flush()
+    
+    # Повторная проверка под блокировкой периодов: месяц мог быть закрыт после первой
+    # проверки. Закрытие ждет commit этой операции и учитывает ее в итогах, либо
+    # операция ждет commit закрытия, видит его и отменяется (см. lock_periods)
+    try:
+        ensure_period_open(transaction.transaction_date)
+    except PeriodError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
     
-    # Обновление балансов счетов
-    if transaction.transaction_type == TransactionType.INCOME and transaction.to_account_id:
-        update_account_balance(transaction.to_account_id, transaction.amount, 'add')
-    elif transaction.transaction_type == TransactionType.EXPENSE and transaction.from_account_id:
-        update_account_balance(transaction.from_account_id, transaction.amount, 'subtract')
-    elif transaction.transaction_type == TransactionType.TRANSFER:
-        if transaction.from_account_id:
-            update_account_balance(transaction.from_account_id, transaction.amount, 'subtract')
-        if transaction.to_account_id:
-            update_account_balance(transaction.to_account_id, transaction.amount, 'add')
+    # Операция и изменение балансов счетов сохраняются одним commit
+    apply_balance_deltas(balance_deltas([transaction]))
     
     db.session.commit()
     
-    return jsonify(transaction.to_dict()), 201
+    # Факт бюджетов уже обновлен счетчиком в том же commit, проверка — один запрос
+    result = transaction.to_dict()
+    result['budget_alerts'] = budget_alerts(transaction, current_app.config['BUDGET_ALERT_THRESHOLD'])
+    # Возможный дубль или нетипичная сумма: операция сохраняется, признаки отдаются клиенту
+    result['anomalies'] = getattr(transaction, 'anomalies', [])
+    return jsonify(result), 201
 
 # API для плановых транзакций
 @financial_bp.route('/planned-transactions', methods=['GET'])
+@read_only
 def get_planned_transactions():
     user = get_current_user()
     
@@ -242,135 +303,478 @@ def create_planned_transaction():
 
 @financial_bp.route('/planned-transactions/<int:pt_id>/complete', methods=['POST'])
 def complete_planned_transaction(pt_id):
-    planned_transaction = PlannedTransaction.query.get_or_404(pt_id)
+    PlannedTransaction.query.get_or_404(pt_id)
     
-    # Создаем фактическую транзакцию
-    transaction = Transaction(
-        transaction_type=planned_transaction.transaction_type,
-        amount=planned_transaction.amount,
-        description=planned_transaction.description,
-        transaction_date=datetime.utcnow(),
-        user_id=planned_transaction.user_id,
-        from_account_id=planned_transaction.from_account_id,
-        to_account_id=planned_transaction.to_account_id,
-        income_category_id=planned_transaction.income_category_id,
-        expense_category_id=planned_transaction.expense_category_id,
-        business_direction_id=planned_transaction.business_direction_id
-    )
+    try:
+        ensure_period_open(datetime.utcnow())
+    except PeriodError as error:
+        return jsonify({'error': str(error)}), 400
     
-    db.session.add(transaction)
-    db.session.flush()  # Получаем ID транзакции
-    
-    # Обновляем плановую транзакцию
-    planned_transaction.is_completed = True
-    planned_transaction.completed_transaction_id = transaction.id
-    
-    # Обновление балансов счетов
-    if transaction.transaction_type == TransactionType.INCOME and transaction.to_account_id:
-        update_account_balance(transaction.to_account_id, transaction.amount, 'add')
-    elif transaction.transaction_type == TransactionType.EXPENSE and transaction.from_account_id:
-        update_account_balance(transaction.from_account_id, transaction.amount, 'subtract')
-    elif transaction.transaction_type == TransactionType.TRANSFER:
-        if transaction.from_account_id:
-            update_account_balance(transaction.from_account_id, transaction.amount, 'subtract')
-        if transaction.to_account_id:
-            update_account_balance(transaction.to_account_id, transaction.amount, 'add')
+    # Создаем фактическую транзакцию и обновляем балансы одним commit
+    transactions = complete_planned([pt_id])
+    if not transactions:
+        return jsonify({'error': 'Planned transaction already completed'}), 409
     
-    db.session.commit()
+    return jsonify(transactions[0].to_dict()), 201
+
+@financial_bp.route('/planned-transactions/complete', methods=['POST'])
+def bulk_complete_planned_transactions():
+    """Выполнение нескольких плановых операций: {"ids": [...]} или {"due": true} — все наступившие"""
+    user = get_current_user()
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        ensure_period_open(datetime.utcnow())
+    except PeriodError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    if data.get('due'):
+        ids = due_planned_ids(user_id=user.id if user.role != UserRole.ADMIN else None)
+    else:
+        ids = [int(pt_id) for pt_id in data.get('ids', [])]
+        if user.role != UserRole.ADMIN and ids:
+            own = db.session.query(PlannedTransaction.id).filter(
+                PlannedTransaction.id.in_(ids),
+                PlannedTransaction.user_id == user.id
+            ).all()
+            ids = [pt_id for pt_id, in own]
+    
+    transactions = complete_planned(ids)
+    completed = {t.id for t in transactions}
+    completed_ids = [
+        pt_id for pt_id, in db.session.query(PlannedTransaction.id).filter(
+            PlannedTransaction.completed_transaction_id.in_(completed)
+        ).all()
+    ] if completed else []
     
-    return jsonify(transaction.to_dict()), 201
+    return jsonify({
+        'completed': completed_ids,
+        'skipped': [pt_id for pt_id in ids if pt_id not in completed_ids],
+        'transactions': [
+            dict(transaction.to_dict(), anomalies=getattr(transaction, 'anomalies', []))
+            for transaction in transactions
+        ]
+    }), 201
 
 # API для отчетов
 @financial_bp.route('/reports/cash-flow', methods=['GET'])
+@read_only
 def cash_flow_report():
+    """Движение ДС: итоги закрытых месяцев берутся из сохраненных данных, остальное считается по операциям"""
     user = get_current_user()
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    
-    query = Transaction.query
-    if user.role != UserRole.ADMIN:
-        query = query.filter_by(user_id=user.id)
-    
-    if start_date:
-        query = query.filter(Transaction.transaction_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Transaction.transaction_date <= datetime.fromisoformat(end_date))
-    
-    transactions = query.all()
-    
-    total_income = sum(float(t.amount) for t in transactions if t.transaction_type == TransactionType.INCOME)
-    total_expense = sum(float(t.amount) for t in transactions if t.transaction_type == TransactionType.EXPENSE)
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+    user_id = user.id if user.role != UserRole.ADMIN else None
+
+    periods = covered_periods(start, end)
+
+    # Закрытые периоды
+    totals = {TransactionType.INCOME: 0.0, TransactionType.EXPENSE: 0.0}
+    if periods:
+        frozen = frozen_totals_query(
+            periods, ClosedPeriodTotal.transaction_type, func.sum(ClosedPeriodTotal.amount), user_id=user_id
+        ).group_by(ClosedPeriodTotal.transaction_type).all()
+        for transaction_type, amount in frozen:
+            if transaction_type in totals:
+                totals[transaction_type] += float(amount)
+
+    # Открытая часть интервала
+    for model in partial_archive_models(start, end, periods):
+        live = db.session.query(model.transaction_type, func.sum(model.amount)).filter(
+            model.transaction_type.in_([TransactionType.INCOME, TransactionType.EXPENSE])
+        )
+        if user_id is not None:
+            live = live.filter(model.user_id == user_id)
+        if start:
+            live = live.filter(model.transaction_date >= start)
+        if end:
+            live = live.filter(model.transaction_date <= end)
+        live = exclude_periods(live, periods, model.transaction_date)
+        for transaction_type, amount in live.group_by(model.transaction_type).all():
+            totals[transaction_type] += float(amount)
+
+    total_income = totals[TransactionType.INCOME]
+    total_expense = totals[TransactionType.EXPENSE]
     net_flow = total_income - total_expense
     
     return jsonify({
         'total_income': total_income,
         'total_expense': total_expense,
         'net_flow': net_flow,
+        'closed_periods': [f'{p.year}-{p.month:02d}' for p in periods],
         'period': {
             'start_date': start_date,
             'end_date': end_date
         }
     })
 
+def _category_totals(category_model, category_column, transaction_type, start, end, periods, user_id):
+    """Суммы по категориям: сохраненные итоги закрытых периодов плюс операции открытой части"""
+    totals = {}
+
+    if periods:
+        frozen = frozen_totals_query(
+            periods, category_model.name, func.sum(ClosedPeriodTotal.amount), user_id=user_id
+        ).join(
+            category_model, category_model.id == getattr(ClosedPeriodTotal, category_column)
+        ).filter(
+            ClosedPeriodTotal.transaction_type == transaction_type
+        ).group_by(category_model.name).all()
+        for name, amount in frozen:
+            totals[name] = totals.get(name, 0.0) + float(amount)
+
+    for model in partial_archive_models(start, end, periods):
+        live = db.session.query(
+            category_model.name,
+            func.sum(model.amount).label('total')
+        ).join(model, getattr(model, category_column) == category_model.id).filter(
+            model.transaction_type == transaction_type
+        )
+        if user_id is not None:
+            live = live.filter(model.user_id == user_id)
+        if start:
+            live = live.filter(model.transaction_date >= start)
+        if end:
+            live = live.filter(model.transaction_date <= end)
+        live = exclude_periods(live, periods, model.transaction_date)
+        for name, amount in live.group_by(category_model.name).all():
+            totals[name] = totals.get(name, 0.0) + float(amount)
+
+    return [{'category': name, 'amount': amount} for name, amount in totals.items()]
+
 @financial_bp.route('/reports/profit-loss', methods=['GET'])
+@read_only
 def profit_loss_report():
     user = get_current_user()
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    
-    query = Transaction.query
-    if user.role != UserRole.ADMIN:
-        query = query.filter_by(user_id=user.id)
-    
-    if start_date:
-        query = query.filter(Transaction.transaction_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Transaction.transaction_date <= datetime.fromisoformat(end_date))
-    
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+    user_id = user.id if user.role != UserRole.ADMIN else None
+
+    periods = covered_periods(start, end)
+
     # Группировка по категориям
-    income_by_category = db.session.query(
-        IncomeCategory.name,
-        func.sum(Transaction.amount).label('total')
-    ).join(Transaction).filter(
-        Transaction.transaction_type == TransactionType.INCOME
+    income_by_category = _category_totals(
+        IncomeCategory, 'income_category_id', TransactionType.INCOME, start, end, periods, user_id
     )
-    
-    if user.role != UserRole.ADMIN:
-        income_by_category = income_by_category.filter(Transaction.user_id == user.id)
-    
-    if start_date:
-        income_by_category = income_by_category.filter(Transaction.transaction_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        income_by_category = income_by_category.filter(Transaction.transaction_date <= datetime.fromisoformat(end_date))
-    
-    income_by_category = income_by_category.group_by(IncomeCategory.name).all()
-    
-    expense_by_category = db.session.query(
-        ExpenseCategory.name,
-        func.sum(Transaction.amount).label('total')
-    ).join(Transaction).filter(
-        Transaction.transaction_type == TransactionType.EXPENSE
+    expense_by_category = _category_totals(
+        ExpenseCategory, 'expense_category_id', TransactionType.EXPENSE, start, end, periods, user_id
     )
     
-    if user.role != UserRole.ADMIN:
-        expense_by_category = expense_by_category.filter(Transaction.user_id == user.id)
-    
-    if start_date:
-        expense_by_category = expense_by_category.filter(Transaction.transaction_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        expense_by_category = expense_by_category.filter(Transaction.transaction_date <= datetime.fromisoformat(end_date))
-    
-    expense_by_category = expense_by_category.group_by(ExpenseCategory.name).all()
-    
     return jsonify({
-        'income_by_category': [{'category': name, 'amount': float(total)} for name, total in income_by_category],
-        'expense_by_category': [{'category': name, 'amount': float(total)} for name, total in expense_by_category],
+        'income_by_category': income_by_category,
+        'expense_by_category': expense_by_category,
+        'closed_periods': [f'{p.year}-{p.month:02d}' for p in periods],
         'period': {
             'start_date': start_date,
             'end_date': end_date
         }
     })
 
+@financial_bp.route('/reports/directions', methods=['GET'])
+@read_only
+def directions_report():
+    """Сводная таблица направление x период x доход/расход одним группирующим запросом.
+
+    Ответ компактный: заголовки строк и столбцов плюс плотный массив
+    data[строка][столбец] = [доход, расход, прибыль, маржа].
+    """
+    user = get_current_user()
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in ('month', 'week'):
+        return jsonify({'error': 'granularity must be "month" or "week"'}), 400
+
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+
+    # Один группирующий запрос; архив добавляется, только если период его захватывает
+    merged = {}
+    for model in transaction_models(start, end):
+        bucket = period_bucket(model.transaction_date, granularity).label('bucket')
+        query = db.session.query(
+            model.business_direction_id,
+            bucket,
+            func.sum(case((model.transaction_type == TransactionType.INCOME, model.amount), else_=0)),
+            func.sum(case((model.transaction_type == TransactionType.EXPENSE, model.amount), else_=0))
+        ).filter(
+            model.transaction_type.in_([TransactionType.INCOME, TransactionType.EXPENSE])
+        )
+        if user.role != UserRole.ADMIN:
+            query = query.filter(model.user_id == user.id)
+        if start:
+            query = query.filter(model.transaction_date >= start)
+        if end:
+            query = query.filter(model.transaction_date <= end)
+        for direction_id, period, income, expense in query.group_by(model.business_direction_id, bucket).all():
+            previous_income, previous_expense = merged.get((direction_id, period), (0, 0))
+            merged[(direction_id, period)] = (previous_income + income, previous_expense + expense)
+    cells = [(direction_id, period, income, expense) for (direction_id, period), (income, expense) in merged.items()]
+
+    directions = {d.id: d for d in BusinessDirection.query.all()}
+    row_ids = [d.id for d in directions.values() if d.is_active]
+    for direction_id, _, _, _ in cells:
+        if direction_id not in row_ids:
+            row_ids.append(direction_id)
+    columns = sorted({period for _, period, _, _ in cells})
+
+    row_index = {direction_id: i for i, direction_id in enumerate(row_ids)}
+    column_index = {period: j for j, period in enumerate(columns)}
+    sums = [[[0.0, 0.0] for _ in columns] for _ in row_ids]
+    for direction_id, period, income, expense in cells:
+        sums[row_index[direction_id]][column_index[period]] = [float(income), float(expense)]
+
+    def measures(income, expense):
+        profit = income - expense
+        margin = round(profit / income, 4) if income else None
+        return [round(income, 2), round(expense, 2), round(profit, 2), margin]
+
+    return jsonify({
+        'granularity': granularity,
+        'rows': [
+            {'id': direction_id, 'name': directions[direction_id].name if direction_id in directions else None}
+            for direction_id in row_ids
+        ],
+        'columns': columns,
+        'measures': ['income', 'expense', 'profit', 'margin'],
+        'data': [[measures(income, expense) for income, expense in row] for row in sums],
+        'row_totals': [
+            measures(sum(cell[0] for cell in row), sum(cell[1] for cell in row)) for row in sums
+        ],
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        }
+    })
+
+# API для подсказок
+@financial_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Подсказки описаний по префиксу из индекса в памяти, с типичными счетами и категориями"""
+    user = get_current_user()
+    field = request.args.get('field', 'description')
+    if field not in SUGGEST_FIELDS:
+        return jsonify({'error': f'Unsupported field "{field}"'}), 400
+    
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_SUGGEST_LIMIT)), MAX_SUGGEST_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    prefix_index.refresh()
+    # Пользователь, не являющийся администратором, видит только свои описания
+    user_id = user.id if user.role != UserRole.ADMIN else None
+    return jsonify(prefix_index.suggest(request.args.get('prefix', ''), user_id, limit))
+
+# API для бюджетов
+@financial_bp.route('/budgets', methods=['GET'])
+@read_only
+def get_budgets():
+    query = Budget.query
+    if request.args.get('year'):
+        query = query.filter_by(year=int(request.args['year']))
+    if request.args.get('month'):
+        query = query.filter_by(month=int(request.args['month']))
+    budgets = query.order_by(Budget.year, Budget.month, Budget.id).all()
+    return jsonify([budget.to_dict() for budget in budgets])
+
+@financial_bp.route('/budgets', methods=['POST'])
+def create_budget():
+    data = request.get_json()
+    
+    targets = [key for key in ('income_category_id', 'expense_category_id', 'business_direction_id') if data.get(key)]
+    if len(targets) != 1:
+        return jsonify({'error': 'Exactly one of income_category_id, expense_category_id, business_direction_id is required'}), 400
+    target = targets[0]
+    
+    if target == 'income_category_id':
+        transaction_type = TransactionType.INCOME
+    elif target == 'expense_category_id':
+        transaction_type = TransactionType.EXPENSE
+    else:
+        transaction_type = TransactionType(data.get('transaction_type', 'expense'))
+    
+    key = {
+        'year': int(data['year']),
+        'month': int(data['month']),
+        'transaction_type': transaction_type,
+        target: int(data[target])
+    }
+    planned_amount = Decimal(str(data['amount']))
+    
+    # Вставки операций ждут commit нового бюджета: ни одна не пройдет между
+    # расчетом начального факта и появлением строки для счетчика
+    lock_periods(exclusive=True)
+    
+    # Повторная установка бюджета на тот же месяц и объект меняет плановую сумму
+    budget = Budget.query.filter_by(**key).first()
+    if budget is None:
+        budget = Budget(planned_amount=planned_amount, actual_amount=Decimal('0'), **key)
+        db.session.add(budget)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Тот же бюджет создан параллельным запросом (SQLite): меняется его плановая сумма
+            db.session.rollback()
+            budget = Budget.query.filter_by(**key).one()
+        else:
+            # Факт по уже внесенным операциям считается в той же транзакции записи; дальше его ведет счетчик
+            recompute_actual(budget)
+    budget.planned_amount = planned_amount
+    
+    db.session.commit()
+    
+    return jsonify(budget.to_dict()), 201
+
+@financial_bp.route('/reports/budget', methods=['GET'])
+@read_only
+def budget_report():
+    """План/факт по бюджетам месяца; факт берется из счетчиков без сканирования операций"""
+    now = datetime.utcnow()
+    year = int(request.args.get('year', now.year))
+    month = int(request.args.get('month', now.month))
+    
+    budgets = Budget.query.filter_by(year=year, month=month).order_by(Budget.id).all()
+    items = [budget.to_dict() for budget in budgets]
+    
+    # Операция с направлением учитывается и в бюджете категории, и в бюджете направления,
+    # поэтому итоги считаются отдельно по каждому виду бюджетов
+    def totals(transaction_type, by_direction):
+        selected = [
+            item for item in items
+            if item['transaction_type'] == transaction_type and (item['business_direction_id'] is not None) == by_direction
+        ]
+        planned = sum(item['planned_amount'] for item in selected)
+        actual = sum(item['actual_amount'] for item in selected)
+        return {
+            'planned_amount': planned,
+            'actual_amount': actual,
+            'percent_used': round(actual / planned * 100, 2) if planned else None
+        }
+    
+    return jsonify({
+        'year': year,
+        'month': month,
+        'budgets': items,
+        'income': {'categories': totals('income', False), 'business_directions': totals('income', True)},
+        'expense': {'categories': totals('expense', False), 'business_directions': totals('expense', True)}
+    })
+
+# API для закрытия периодов
+@financial_bp.route('/periods', methods=['GET'])
+@read_only
+def get_closed_periods():
+    periods = ClosedPeriod.query.order_by(ClosedPeriod.period_start).all()
+    return jsonify([period.to_dict() for period in periods])
+
+@financial_bp.route('/periods/close', methods=['POST'])
+def close_period_endpoint():
+    user = get_current_user()
+    if user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Only administrators can close periods'}), 403
+
+    data = request.get_json()
+    try:
+        period = close_period(int(data['year']), int(data['month']), user)
+    except PeriodError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
+
+    return jsonify(period.to_dict()), 201
+
+# API для архивации
+@financial_bp.route('/archive', methods=['GET'])
+@read_only
+def get_archive():
+    runs = ArchiveRun.query.order_by(ArchiveRun.id).all()
+    summaries = ArchiveSummary.query.all()
+    return jsonify({
+        'runs': [run.to_dict() for run in runs],
+        'summaries': [summary.to_dict() for summary in summaries]
+    })
+
+@financial_bp.route('/archive/run', methods=['POST'])
+def run_archive():
+    user = get_current_user()
+    if user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Only administrators can archive transactions'}), 403
+
+    data = request.get_json(silent=True) or {}
+    horizon_days = int(data.get(
+        'horizon_days', current_app.config.get('ARCHIVE_HORIZON_DAYS', DEFAULT_ARCHIVE_HORIZON_DAYS)
+    ))
+    runs = archive_transactions(horizon_days)
+    return jsonify([run.to_dict() for run in runs]), 201
+
+@financial_bp.route('/dashboard', methods=['GET'])
+@read_only
+def dashboard():
+    """Сводка для дашборда, рассчитанная несколькими агрегирующими запросами"""
+    user = get_current_user()
+    now = datetime.utcnow()
+    cache_key = (user.id, user.role, now.date())
+    summary = dashboard_cache.get(cache_key)
+    if summary is not None:
+        return jsonify(summary)
+
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    # Общий остаток по активным счетам
+    total_balance = db.session.query(
+        func.coalesce(func.sum(Account.current_balance), 0)
+    ).filter(Account.is_active == True).scalar()
+
+    # Доходы и расходы с начала месяца одним запросом
+    month_totals = db.session.query(
+        func.coalesce(func.sum(case(
+            (Transaction.transaction_type == TransactionType.INCOME, Transaction.amount), else_=0
+        )), 0),
+        func.coalesce(func.sum(case(
+            (Transaction.transaction_type == TransactionType.EXPENSE, Transaction.amount), else_=0
+        )), 0)
+    ).filter(Transaction.transaction_date >= month_start)
+    if user.role != UserRole.ADMIN:
+        month_totals = month_totals.filter(Transaction.user_id == user.id)
+    month_income, month_expense = month_totals.one()
+
+    # Топ-5 категорий расходов с начала месяца
+    total = func.sum(Transaction.amount).label('total')
+    top_expenses = db.session.query(ExpenseCategory.name, total).join(Transaction).filter(
+        Transaction.transaction_type == TransactionType.EXPENSE,
+        Transaction.transaction_date >= month_start
+    )
+    if user.role != UserRole.ADMIN:
+        top_expenses = top_expenses.filter(Transaction.user_id == user.id)
+    top_expenses = top_expenses.group_by(ExpenseCategory.id, ExpenseCategory.name).order_by(total.desc()).limit(5).all()
+
+    # Просроченные и предстоящие на 7 дней плановые операции одним запросом
+    planned = PlannedTransaction.query.filter(
+        PlannedTransaction.is_completed == False,
+        PlannedTransaction.planned_date < now + timedelta(days=7)
+    )
+    if user.role != UserRole.ADMIN:
+        planned = planned.filter(PlannedTransaction.user_id == user.id)
+    planned = planned.order_by(PlannedTransaction.planned_date).all()
+
+    summary = {
+        'total_balance': float(total_balance),
+        'month_to_date': {
+            'start_date': month_start.isoformat(),
+            'total_income': float(month_income),
+            'total_expense': float(month_expense),
+            'net_flow': float(month_income) - float(month_expense)
+        },
+        'top_expense_categories': [{'category': name, 'amount': float(amount)} for name, amount in top_expenses],
+        'upcoming_planned': [pt.to_dict() for pt in planned if pt.planned_date >= now],
+        'overdue_planned': [pt.to_dict() for pt in planned if pt.planned_date < now]
+    }
+    dashboard_cache.set(cache_key, summary)
+    return jsonify(summary)
+
 # Инициализация тестовых данных
 @financial_bp.route('/init-test-data', methods=['POST'])
 def init_test_data():
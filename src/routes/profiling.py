@@ -0,0 +1,39 @@
+from flask import Blueprint, Response, jsonify
+from src.models.financial import UserRole
+from src.routes.financial import get_current_user
+from src.profiling import profile_store
+
+profiling_bp = Blueprint('profiling', __name__)
+
+# API для профилей запросов (только администратор)
+@profiling_bp.route('/profiles', methods=['GET'])
+def get_profiles():
+    """Последние профили по эндпоинтам: общее время, SQL, сериализация, Python"""
+    user = get_current_user()
+    if user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Only administrators can view profiles'}), 403
+    return jsonify(profile_store.list())
+
+@profiling_bp.route('/profiles/<int:profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    user = get_current_user()
+    if user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Only administrators can view profiles'}), 403
+    stored = profile_store.get(profile_id)
+    if stored is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(stored[0])
+
+@profiling_bp.route('/profiles/<int:profile_id>/download', methods=['GET'])
+def download_profile(profile_id):
+    """Файл pstats для snakeviz или python -m pstats"""
+    user = get_current_user()
+    if user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Only administrators can view profiles'}), 403
+    stored = profile_store.get(profile_id)
+    if stored is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    entry, data = stored
+    return Response(data, mimetype='application/octet-stream', headers={
+        'Content-Disposition': f'attachment; filename=profile-{profile_id}-{entry["endpoint"]}.prof'
+    })
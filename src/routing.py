@@ -0,0 +1,79 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, session, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+# Ключ cookie-сессии Flask: до этого момента чтения клиента идут в основную БД
+PRIMARY_UNTIL_KEY = 'read_primary_until'
+DEFAULT_READ_YOUR_WRITES_SECONDS = 5
+
+
+class RoutingSession(Session):
+    """Сессия, отправляющая чтения эндпоинтов только для чтения на реплику.
+
+    Запись (flush, INSERT/UPDATE/DELETE) и все чтения после записи
+    в рамках запроса всегда идут в основную БД.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self._flushing or isinstance(clause, UpdateBase) or self.info.get('has_written'):
+            return False
+        if not has_request_context() or not g.get('use_replica'):
+            return False
+        return REPLICA_BIND in self._db.engines
+
+
+def read_only(view):
+    """Эндпоинт только для чтения: запросы можно выполнять на реплике.
+
+    После собственной записи клиента его чтения READ_YOUR_WRITES_SECONDS секунд
+    идут в основную БД, чтобы он видел свои изменения несмотря на задержку репликации.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not g.get('force_primary') and session.get(PRIMARY_UNTIL_KEY, 0) < time.time()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def primary():
+    """Чтения внутри блока идут в основную БД: решения о записи не принимаются по данным реплики"""
+    previous = g.get('use_replica')
+    g.use_replica = False
+    try:
+        yield
+    finally:
+        g.use_replica = previous
+
+
+def _mark_written(db_session, flush_context):
+    db_session.info['has_written'] = True
+
+
+def _stick_to_primary(db_session):
+    if not has_request_context():
+        return
+    window = current_app.config.get('READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS)
+    session[PRIMARY_UNTIL_KEY] = time.time() + window
+
+
+def init_routing(app, db):
+    """Включение маршрутизации на реплику, если задана привязка SQLALCHEMY_BINDS['replica']"""
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS)
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    if event.contains(db.session, 'after_flush', _mark_written):
+        return
+    event.listen(db.session, 'after_flush', _mark_written)
+    event.listen(db.session, 'after_commit', _stick_to_primary)
@@ -414,6 +414,7 @@ function showTransactionModal() {
 function hideTransactionModal() {
     document.getElementById('transaction-modal').classList.add('hidden');
     document.getElementById('transaction-form').reset();
+    hideDescriptionSuggestions();
 }
 
 function updateTransactionFormFields() {
@@ -433,6 +434,159 @@ function updateTransactionFormFields() {
         type === 'expense' ? 'block' : 'none';
 }
 
+// Поток событий сервера: точечное обновление данных вместо повторной загрузки списков.
+// Поток приходит только от процесса, к которому подключен клиент, и может не содержать
+// собственных изменений, сделанных через другой процесс: они берутся из ответов API.
+// Если событие о своей операции все же пришло, повторно она не добавляется (addTransaction)
+let eventSource = null;
+
+// Повторное подключение, если сервер отказал (например, превышен лимит подписчиков)
+const EVENTS_RETRY_MS = 30000;
+
+function findById(list, id) {
+    return list.find(item => item.id === id) || null;
+}
+
+// Добавление операции из ответа API или события; одна и та же операция добавляется один раз
+function addTransaction(transaction) {
+    if (transactions.some(t => t.id === transaction.id)) {
+        return;
+    }
+    transactions.unshift(transaction);
+    transactions.sort((a, b) => new Date(b.transaction_date) - new Date(a.transaction_date));
+    updateTransactionsList();
+    updateRecentTransactions();
+    updateDashboardStats();
+}
+
+function subscribeToEvents() {
+    if (!window.EventSource) {
+        return;
+    }
+    eventSource = new EventSource(`${API_BASE}/events`);
+
+    eventSource.addEventListener('error', () => {
+        // Закрытое соединение браузер не восстанавливает сам
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            setTimeout(subscribeToEvents, EVENTS_RETRY_MS);
+        }
+    });
+
+    eventSource.addEventListener('transaction_created', event => {
+        const data = JSON.parse(event.data);
+        addTransaction({
+            ...data,
+            from_account: findById(accounts, data.from_account_id),
+            to_account: findById(accounts, data.to_account_id),
+            income_category: findById(incomeCategories, data.income_category_id),
+            expense_category: findById(expenseCategories, data.expense_category_id),
+            business_direction: findById(businessDirections, data.business_direction_id)
+        });
+    });
+
+    eventSource.addEventListener('account_balance', event => {
+        const data = JSON.parse(event.data);
+        const account = findById(accounts, data.account_id);
+        if (!account) {
+            loadAccounts();
+            return;
+        }
+        account.current_balance = data.current_balance;
+        updateAccountSelects();
+        updateAccountsList();
+        updateDashboardStats();
+    });
+
+    eventSource.addEventListener('planned_completed', event => {
+        const data = JSON.parse(event.data);
+        plannedTransactions = plannedTransactions.filter(pt => pt.id !== data.id);
+        updatePlannedTransactionsList();
+    });
+
+    // Сервер пропустил события (переполнение очереди или другой процесс) — полная перезагрузка
+    eventSource.addEventListener('resync', () => loadAllData());
+}
+
+// Подсказки описаний: ответ сервера берется из индекса в памяти, запрос — после паузы в наборе
+let suggestTimer = null;
+let suggestions = [];
+
+function hideDescriptionSuggestions() {
+    suggestions = [];
+    document.getElementById('description-suggestions').classList.add('hidden');
+}
+
+function scheduleDescriptionSuggestions() {
+    clearTimeout(suggestTimer);
+    const prefix = document.getElementById('transaction-description').value.trim();
+    if (prefix.length < 2) {
+        hideDescriptionSuggestions();
+        return;
+    }
+    suggestTimer = setTimeout(() => loadDescriptionSuggestions(prefix), 150);
+}
+
+async function loadDescriptionSuggestions(prefix) {
+    try {
+        suggestions = await apiCall(`/suggest?field=description&prefix=${encodeURIComponent(prefix)}&limit=8`);
+    } catch (error) {
+        suggestions = [];
+    }
+    // Пока шел запрос, пользователь мог продолжить ввод
+    if (document.getElementById('transaction-description').value.trim() !== prefix) {
+        return;
+    }
+    updateDescriptionSuggestions();
+}
+
+function updateDescriptionSuggestions() {
+    const container = document.getElementById('description-suggestions');
+    if (suggestions.length === 0) {
+        container.classList.add('hidden');
+        return;
+    }
+    container.innerHTML = '';
+    suggestions.forEach((suggestion, index) => {
+        const item = document.createElement('div');
+        item.className = 'px-3 py-1 text-sm text-gray-700 cursor-pointer hover:bg-gray-100';
+        item.textContent = suggestion.value;
+        // mousedown срабатывает раньше blur поля ввода
+        item.addEventListener('mousedown', e => {
+            e.preventDefault();
+            applyDescriptionSuggestion(index);
+        });
+        container.appendChild(item);
+    });
+    container.classList.remove('hidden');
+}
+
+function applyDescriptionSuggestion(index) {
+    const suggestion = suggestions[index];
+    document.getElementById('transaction-description').value = suggestion.value;
+
+    // Типичные значения подставляются только в незаполненные поля
+    const defaults = suggestion.defaults;
+    const fields = {
+        'from-account': defaults.from_account_id,
+        'to-account': defaults.to_account_id,
+        'income-category': defaults.income_category_id,
+        'expense-category': defaults.expense_category_id,
+        'business-direction': defaults.business_direction_id
+    };
+    if (defaults.transaction_type && !document.getElementById('transaction-amount').value) {
+        document.getElementById('transaction-type').value = defaults.transaction_type;
+        updateTransactionFormFields();
+    }
+    Object.entries(fields).forEach(([id, value]) => {
+        const select = document.getElementById(id);
+        if (value && !select.value) {
+            select.value = String(value);
+        }
+    });
+    hideDescriptionSuggestions();
+}
+
 // Создание операции
 async function createTransaction(formData) {
     try {
@@ -443,7 +597,8 @@ async function createTransaction(formData) {
         
         showSuccess('Операция успешно создана');
         hideTransactionModal();
-        await loadTransactions();
+        // Событие об этой операции может прийти от другого процесса сервера и не дойти до клиента
+        addTransaction(transaction);
         await loadAccounts(); // Обновить балансы счетов
     } catch (error) {
         showError('Не удалось создать операцию');
@@ -453,13 +608,14 @@ async function createTransaction(formData) {
 // Выполнение плановой операции
 async function completePlannedTransaction(plannedId) {
     try {
-        await apiCall(`/planned-transactions/${plannedId}/complete`, {
+        const transaction = await apiCall(`/planned-transactions/${plannedId}/complete`, {
             method: 'POST'
         });
         
         showSuccess('Плановая операция выполнена');
-        await loadPlannedTransactions();
-        await loadTransactions();
+        plannedTransactions = plannedTransactions.filter(pt => pt.id !== plannedId);
+        updatePlannedTransactionsList();
+        addTransaction(transaction);
         await loadAccounts();
     } catch (error) {
         showError('Не удалось выполнить плановую операцию');
@@ -540,16 +696,58 @@ async function initTestData() {
     }
 }
 
-// Загрузка всех данных
+// Загрузка всех данных одним пакетным запросом
 async function loadAllData() {
-    await Promise.all([
-        loadAccounts(),
-        loadIncomeCategories(),
-        loadExpenseCategories(),
-        loadBusinessDirections(),
-        loadTransactions(),
-        loadPlannedTransactions()
-    ]);
+    try {
+        const batch = await apiCall('/batch', {
+            method: 'POST',
+            body: JSON.stringify({
+                requests: [
+                    { method: 'GET', path: '/accounts' },
+                    { method: 'GET', path: '/income-categories' },
+                    { method: 'GET', path: '/expense-categories' },
+                    { method: 'GET', path: '/business-directions' },
+                    { method: 'GET', path: '/transactions' },
+                    { method: 'GET', path: '/planned-transactions' }
+                ]
+            })
+        });
+
+        const [accountsRes, incomeRes, expenseRes, directionsRes, transactionsRes, plannedRes] = batch.responses;
+        if (batch.responses.some(res => res.status !== 200)) {
+            throw new Error('Batch sub-request failed');
+        }
+
+        accounts = accountsRes.body;
+        incomeCategories = incomeRes.body;
+        expenseCategories = expenseRes.body;
+        businessDirections = directionsRes.body;
+        transactions = transactionsRes.body;
+        plannedTransactions = plannedRes.body;
+
+        updateAccountSelects();
+        updateAccountsList();
+        updateIncomeCategorySelect();
+        updateIncomeCategoriesList();
+        updateExpenseCategorySelect();
+        updateExpenseCategoriesList();
+        updateBusinessDirectionSelect();
+        updateBusinessDirectionsList();
+        updateTransactionsList();
+        updateRecentTransactions();
+        updateDashboardStats();
+        updatePlannedTransactionsList();
+    } catch (error) {
+        // Резервный вариант: отдельные запросы
+        await Promise.all([
+            loadAccounts(),
+            loadIncomeCategories(),
+            loadExpenseCategories(),
+            loadBusinessDirections(),
+            loadTransactions(),
+            loadPlannedTransactions()
+        ]);
+    }
 }
 
 // Обработчики событий
@@ -567,6 +765,8 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Форма операции
     document.getElementById('transaction-type').addEventListener('change', updateTransactionFormFields);
+    document.getElementById('transaction-description').addEventListener('input', scheduleDescriptionSuggestions);
+    document.getElementById('transaction-description').addEventListener('blur', hideDescriptionSuggestions);
     document.getElementById('transaction-form').addEventListener('submit', function(e) {
         e.preventDefault();
         
@@ -598,5 +798,6 @@ document.addEventListener('DOMContentLoaded', function() {
     // Инициализация
     initTestData().then(() => {
         showSection('dashboard');
+        subscribeToEvents();
     });
 });
\ No newline at end of file
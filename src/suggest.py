@@ -0,0 +1,173 @@
+import bisect
+import heapq
+import threading
+import time
+
+from sqlalchemy import event, func, select
+
+from src.models.financial import db, Transaction, ArchivedTransaction
+from src.incremental import IdWindow
+
+DEFAULT_SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 50
+DEFAULT_SUGGEST_REFRESH_SECONDS = 1.0
+SUGGEST_FIELDS = ('description',)
+# Короткие префиксы охватывают большую часть индекса: их ответы кэшируются до следующей вставки
+SHORT_PREFIX_LENGTH = 2
+# Поля операции, которые подсказка предлагает заполнить вместе с описанием
+DEFAULT_FIELDS = (
+    'transaction_type', 'from_account_id', 'to_account_id',
+    'income_category_id', 'expense_category_id', 'business_direction_id'
+)
+
+
+def normalize(text):
+    """Ключ индекса: нижний регистр, пробелы схлопнуты"""
+    return ' '.join((text or '').lower().split())
+
+
+class PrefixIndex:
+    """Индекс различных описаний операций для подсказок по префиксу.
+
+    Нормализованные описания хранятся в отсортированном списке, поиск —
+    двоичный поиск начала диапазона и отбор самых частых из диапазона.
+    Для каждого описания ведется частота по пользователям и частота
+    сочетаний счетов, категорий и направления — самое частое сочетание
+    предлагается как значения по умолчанию.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.refresh_seconds = DEFAULT_SUGGEST_REFRESH_SECONDS
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+            self.window = IdWindow()
+            self.refreshed_at = 0.0
+            self.keys = []
+            self.entries = {}
+            self.short_cache = {}
+
+    def _add(self, description, user_id, defaults, count=1):
+        key = normalize(description)
+        if not key:
+            return
+        self.short_cache.clear()
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {'text': ' '.join(description.split()), 'count': 0, 'users': {}, 'defaults': {}}
+            bisect.insort(self.keys, key)
+        entry['count'] += count
+        entry['users'][user_id] = entry['users'].get(user_id, 0) + count
+        entry['defaults'][defaults] = entry['defaults'].get(defaults, 0) + count
+
+    def load(self):
+        """Начальная загрузка одним группирующим запросом по операциям и архиву"""
+        with self.lock:
+            self.reset()
+            for model in (Transaction, ArchivedTransaction):
+                columns = [model.description, model.user_id] + [getattr(model, field) for field in DEFAULT_FIELDS]
+                rows = db.session.execute(
+                    select(*columns, func.count(model.id)).where(
+                        model.description.isnot(None)
+                    ).group_by(*columns)
+                )
+                for description, user_id, *defaults, count in rows:
+                    self._add(description, user_id, tuple(defaults), count)
+            # Уже учтенные операции окна перекрытия: первая догрузка не должна посчитать их повторно
+            self.window.seed(db.session.execute)
+            self.refreshed_at = time.monotonic()
+            self.loaded = True
+
+    def add(self, transaction_id, description, user_id, defaults):
+        """Учет закоммиченной операции"""
+        with self.lock:
+            if not self.loaded or not self.window.add(transaction_id):
+                return
+            self._add(description, user_id, defaults)
+
+    def refresh(self):
+        """Догрузка операций других процессов не чаще refresh_seconds"""
+        with self.lock:
+            if not self.loaded:
+                self.load()
+                return
+            if time.monotonic() - self.refreshed_at < self.refresh_seconds:
+                return
+            columns = [Transaction.id, Transaction.description, Transaction.user_id] + \
+                [getattr(Transaction, field) for field in DEFAULT_FIELDS]
+            rows = db.session.execute(select(*columns).where(self.window.condition()))
+            for transaction_id, description, user_id, *defaults in rows:
+                self.add(transaction_id, description, user_id, tuple(defaults))
+            self.refreshed_at = time.monotonic()
+
+    def suggest(self, prefix, user_id=None, limit=DEFAULT_SUGGEST_LIMIT):
+        """Самые частые описания, начинающиеся с prefix (user_id — только описания этого пользователя)"""
+        prefix = normalize(prefix)
+        with self.lock:
+            cache_key = (prefix, user_id, limit)
+            if len(prefix) <= SHORT_PREFIX_LENGTH and cache_key in self.short_cache:
+                return self.short_cache[cache_key]
+            start = bisect.bisect_left(self.keys, prefix)
+            # Все строки с префиксом prefix лежат до prefix + максимальный символ
+            end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+
+            def frequency(key):
+                entry = self.entries[key]
+                return entry['count'] if user_id is None else entry['users'].get(user_id, 0)
+
+            matches = heapq.nlargest(
+                limit,
+                (key for key in self.keys[start:end] if frequency(key)),
+                key=lambda key: (frequency(key), key == prefix)
+            )
+            results = []
+            for key in matches:
+                entry = self.entries[key]
+                defaults = max(entry['defaults'].items(), key=lambda item: item[1])[0]
+                results.append({
+                    'value': entry['text'],
+                    'count': frequency(key),
+                    'defaults': {
+                        field: value.value if hasattr(value, 'value') else value
+                        for field, value in zip(DEFAULT_FIELDS, defaults)
+                    }
+                })
+            if len(prefix) <= SHORT_PREFIX_LENGTH:
+                self.short_cache[cache_key] = results
+            return results
+
+
+def _collect_descriptions(session, flush_context):
+    pending = session.info.setdefault('suggest_pending', [])
+    for obj in session.new:
+        if isinstance(obj, Transaction) and obj.description:
+            pending.append((
+                obj.id, obj.description, obj.user_id,
+                tuple(getattr(obj, field) for field in DEFAULT_FIELDS)
+            ))
+
+
+def _add_committed(session):
+    for item in session.info.pop('suggest_pending', ()):
+        prefix_index.add(*item)
+
+
+def _discard_pending(session):
+    session.info.pop('suggest_pending', None)
+
+
+def init_suggest(app, db):
+    """Обновление индекса подсказок по закоммиченным операциям"""
+    prefix_index.refresh_seconds = app.config.setdefault('SUGGEST_REFRESH_SECONDS', DEFAULT_SUGGEST_REFRESH_SECONDS)
+    if event.contains(db.session, 'after_flush', _collect_descriptions):
+        return
+    event.listen(db.session, 'after_flush', _collect_descriptions)
+    event.listen(db.session, 'after_commit', _add_committed)
+    event.listen(db.session, 'after_rollback', _discard_pending)
+
+
+# Индекс процесса
+prefix_index = PrefixIndex()